@@ -4,6 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from summarizer import router as summary_router
 from visualizer import router as visualizer_router
 from qna import router as qna_router
+from datasets import router as datasets_router
+from chart_cache import chart_cache
+from chat_sessions import chat_sessions
+from chart_renderer import chart_engine
+from llm_cache import llm_cache
+from llm_client import llm_client
+from single_flight import coalescing_stats
+from jobs import job_queue
 
 app = FastAPI(title="DataNova API", version="3.0")
 
@@ -20,6 +28,7 @@ app.add_middleware(
 app.include_router(summary_router, prefix="/api")
 app.include_router(visualizer_router, prefix="/api")
 app.include_router(qna_router, prefix="/api")
+app.include_router(datasets_router, prefix="/api")
 
 
 # ---------------- ROOT ---------------- #
@@ -29,7 +38,21 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "version": "3.0"}
+    return {"status": "healthy", "version": "3.0", "llm_cache": llm_cache.stats(), "chart_cache": chart_cache.stats(),
+            "chat_sessions": chat_sessions.stats(), "coalescing": coalescing_stats(),
+            "jobs": job_queue.stats()}
+
+
+@app.on_event("startup")
+async def startup_event():
+    await chart_engine.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm_client.aclose()
+    chart_engine.shutdown()
+    await job_queue.shutdown()
 
 
 if __name__ == "__main__":
@@ -79,9 +79,18 @@ if uploaded_file:
     # -------- CHATBOT -------- #
     st.markdown("### 💬 DataNova Assistant")
 
-    if "messages" not in st.session_state:
+    # One server-side chat session per uploaded file; the file is sent only when it opens
+    file_key = f"{uploaded_file.name}:{uploaded_file.size}"
+    if st.session_state.get("chat_file") != file_key:
+        st.session_state.chat_file = file_key
+        st.session_state.chat_session_id = None
         st.session_state.messages = []
 
+    def open_chat_session():
+        res = requests.post(f"{BACKEND_URL}/chat/sessions", files={"file": uploaded_file}, data={"mode": chat_mode})
+        res.raise_for_status()
+        st.session_state.chat_session_id = res.json()["session_id"]
+
     for msg in st.session_state.messages:
         css = "chat-user" if msg["role"]=="user" else "chat-ai"
         st.markdown(f"<div class='{css}'>{msg['content']}</div>", unsafe_allow_html=True)
@@ -91,15 +100,25 @@ if uploaded_file:
     if question:
         st.session_state.messages.append({"role":"user","content":question})
 
-        files = {"file": uploaded_file}
+        # The mode is sent with every message, so changing it applies to an open session too
         data = {"question": question, "mode": chat_mode}
 
         with st.spinner("Thinking..."):
-            res = requests.post(f"{BACKEND_URL}/chat", files=files, data=data)
-
-            if res.status_code == 200:
-                answer = res.json()["answer"]
-            else:
+            try:
+                if not st.session_state.chat_session_id:
+                    open_chat_session()
+                res = requests.post(f"{BACKEND_URL}/chat/sessions/{st.session_state.chat_session_id}/messages", data=data)
+
+                if res.status_code == 404:
+                    # Session expired on the server: reopen it and ask again
+                    open_chat_session()
+                    res = requests.post(f"{BACKEND_URL}/chat/sessions/{st.session_state.chat_session_id}/messages", data=data)
+
+                if res.status_code == 200:
+                    answer = res.json()["answer"]
+                else:
+                    answer = "Error contacting AI service."
+            except requests.RequestException:
                 answer = "Error contacting AI service."
 
         st.session_state.messages.append({"role":"assistant","content":answer})
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Upper bound for cached chart artifacts kept in memory
+CHART_CACHE_MAX_BYTES = int(os.getenv("DATANOVA_CHART_CACHE_MB", "256")) * 1024 * 1024
+# How many chart recipes (dataset + options) are remembered for on-demand rendering
+CHART_RECIPE_MAX_ENTRIES = int(os.getenv("DATANOVA_CHART_RECIPES", "4096"))
+
+# Bump when render_chart output changes so stale artifacts and ETags are not reused
+RENDER_VERSION = 1
+
+
+# ---------------- CHART ARTIFACT CACHE ---------------- #
+
+class ChartCache:
+    """
+    Rendered charts keyed by dataset content hash plus the normalized chart
+    config. Rendering is deterministic for a given key, so the key doubles
+    as the ETag. Bounded by total artifact size with LRU eviction.
+    """
+
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES, max_recipes: int = CHART_RECIPE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_recipes = max_recipes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._recipes: "OrderedDict[str, tuple[str, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(dataset_id: str, config: dict) -> str:
+        normalized = json.dumps(
+            {"dataset_id": dataset_id, "config": config, "version": RENDER_VERSION},
+            sort_keys=True
+        )
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return f'"{key}"'
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key: str, image: bytes, **metadata):
+        size = len(image)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old["image"])
+
+            while self._entries and self.total_bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted["image"])
+
+            self._entries[key] = {"image": image, **metadata}
+            self.total_bytes += size
+
+    def remember_recipe(self, key: str, dataset_id: str, options: dict):
+        """Keep what is needed to (re)render a chart URL after its artifact is evicted"""
+        with self._lock:
+            self._recipes[key] = (dataset_id, options)
+            self._recipes.move_to_end(key)
+            while len(self._recipes) > self.max_recipes:
+                self._recipes.popitem(last=False)
+
+    def recipe(self, key: str) -> Optional[tuple[str, dict]]:
+        with self._lock:
+            return self._recipes.get(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "charts": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+chart_cache = ChartCache()
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches the given ETag"""
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,202 @@
+import os
+import warnings
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from profiler import ColumnProfile, DatasetProfile, is_numeric_series
+
+# head: plot the first `limit` rows; sample: `limit` rows from the dataset's
+# reproducible sample; full: aggregate the whole column
+CHART_MODES = ["head", "sample", "full"]
+
+# Fixed output sizes for full-data charts, whatever the dataset size
+LINE_POINTS = int(os.getenv("DATANOVA_LINE_POINTS", "2000"))
+SCATTER_POINTS = int(os.getenv("DATANOVA_SCATTER_POINTS", "5000"))
+DENSITY_BINS = int(os.getenv("DATANOVA_DENSITY_BINS", "100"))
+HIST_BINS = 30
+MAX_GROUPS = 50
+PIE_SLICES = 10
+
+
+# ---------------- DOWNSAMPLING ---------------- #
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep
+    the visual shape of a series sorted by x. O(n), one pass over the data.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_start = min(end, n - 1)
+
+        # Triangle against the previous pick and the mean of the next bucket
+        avg_x = x[next_start:max(next_end, next_start + 1)].mean()
+        avg_y = y[next_start:max(next_end, next_start + 1)].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        # Non-date text falls back to per-element parsing and warns about it
+        warnings.simplefilter("ignore", UserWarning)
+        return pd.to_datetime(series, errors="coerce")
+
+
+def as_sortable(series: pd.Series):
+    """(float64 positions, display values) for numeric or date-like columns, else None"""
+    if is_numeric_series(series):
+        return series.to_numpy(dtype="float64", na_value=np.nan), series
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed = series
+    else:
+        # Decide on a sample before parsing millions of strings
+        sample = series.dropna().head(1000)
+        if sample.empty or parse_dates(sample).notna().mean() < 0.9:
+            return None
+        parsed = parse_dates(series)
+
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_convert(None)
+
+    positions = parsed.to_numpy().view("int64").astype("float64")
+    positions[parsed.isna().to_numpy()] = np.nan
+    return positions, parsed
+
+
+# ---------------- AGGREGATION BY CHART TYPE ---------------- #
+
+def aggregate_line(df: pd.DataFrame, x_axis: str, y_axis: str) -> tuple[pd.DataFrame, str]:
+    y = df[y_axis]
+    if not is_numeric_series(y):
+        raise HTTPException(status_code=400, detail=f"Full-data line charts need a numeric Y axis: {y_axis}")
+
+    sortable = as_sortable(df[x_axis])
+    if sortable is None:
+        # Categorical x: one point per category
+        grouped = y.groupby(df[x_axis], sort=True, observed=True).mean().head(MAX_GROUPS)
+        return pd.DataFrame({"x": grouped.index, "y": grouped.to_numpy()}), "grouped"
+
+    positions, display = sortable
+    values = y.to_numpy(dtype="float64", na_value=np.nan)
+    valid = ~(np.isnan(positions) | np.isnan(values))
+    order = np.argsort(positions[valid], kind="stable")
+
+    xs, ys = positions[valid][order], values[valid][order]
+    keep = lttb(xs, ys, LINE_POINTS)
+    display = display.to_numpy()[valid][order][keep]
+    return pd.DataFrame({"x": display, "y": ys[keep]}), "downsampled"
+
+
+def aggregate_scatter(df: pd.DataFrame, x_axis: str, y_axis: str) -> tuple[pd.DataFrame, str]:
+    if not (is_numeric_series(df[x_axis]) and is_numeric_series(df[y_axis])):
+        raise HTTPException(status_code=400, detail="Full-data scatter charts need numeric X and Y axes")
+
+    xs = df[x_axis].to_numpy(dtype="float64", na_value=np.nan)
+    ys = df[y_axis].to_numpy(dtype="float64", na_value=np.nan)
+    valid = np.isfinite(xs) & np.isfinite(ys)
+    xs, ys = xs[valid], ys[valid]
+
+    if len(xs) <= SCATTER_POINTS:
+        return pd.DataFrame({"x": xs, "y": ys}), "points"
+
+    # 2-D density: bin centers weighted by the number of points in each bin
+    counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=DENSITY_BINS)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    xi, yi = np.nonzero(counts)
+    return pd.DataFrame({"x": x_centers[xi], "y": y_centers[yi], "count": counts[xi, yi]}), "density"
+
+
+def top_counts(series: pd.Series, n: int, column: Optional[ColumnProfile] = None) -> pd.Series:
+    """Most frequent values, from the column's top-k sketch when one is available"""
+    if column is not None and not column.numeric:
+        return column.top_sketch.top(n)
+    counts = series.value_counts()
+    return counts[counts > 0].head(n)   # category columns also list their unused categories
+
+
+def aggregate_hist(df: pd.DataFrame, x_axis: str, column: Optional[ColumnProfile] = None) -> tuple[pd.DataFrame, str]:
+    series = df[x_axis]
+    if not is_numeric_series(series):
+        counts = top_counts(series, MAX_GROUPS, column)
+        return pd.DataFrame({"x": counts.index.astype(str), "count": counts.to_numpy()}), "counts"
+
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=HIST_BINS)
+    return pd.DataFrame({"left": edges[:-1], "right": edges[1:], "count": counts}), "binned"
+
+
+def aggregate_bar(
+    df: pd.DataFrame,
+    x_axis: str,
+    y_axis: str,
+    limit: int,
+    column: Optional[ColumnProfile] = None
+) -> tuple[pd.DataFrame, str]:
+    y = df[y_axis]
+    if not is_numeric_series(y):
+        raise HTTPException(status_code=400, detail=f"Full-data bar charts need a numeric Y axis: {y_axis}")
+
+    groups_wanted = min(limit, MAX_GROUPS) if limit > 0 else MAX_GROUPS
+    x = df[x_axis]
+    if column is not None and not column.numeric and column.distinct > groups_wanted:
+        # Only group the largest categories instead of hashing every distinct value
+        keep = x.isin(column.top_sketch.top(groups_wanted).index)
+        x, y = x[keep], y[keep]
+
+    # Largest groups first, then displayed in x order
+    groups = y.groupby(x, observed=True).agg(["mean", "size"])
+    groups = groups.nlargest(groups_wanted, "size").sort_index()
+    return pd.DataFrame({"x": groups.index, "y": groups["mean"].to_numpy()}), "grouped"
+
+
+def aggregate_pie(df: pd.DataFrame, x_axis: str, column: Optional[ColumnProfile] = None) -> tuple[pd.DataFrame, str]:
+    counts = top_counts(df[x_axis], PIE_SLICES, column)
+    return pd.DataFrame({"x": counts.index.astype(str), "count": counts.to_numpy()}), "counts"
+
+
+def aggregate_chart_data(
+    df: pd.DataFrame,
+    options: dict,
+    stats: Optional[DatasetProfile] = None
+) -> tuple[pd.DataFrame, str]:
+    """
+    Reduce the full plotted columns to a fixed-size frame for rendering.
+    Returns the frame and its aggregation kind, which tells the renderer
+    how to draw it. With the dataset's column stats, category counts come
+    from the top-k sketches instead of a value_counts() over every row.
+    """
+    chart_type, x_axis, y_axis = options["chart_type"], options["x_axis"], options["y_axis"]
+    column = stats.columns.get(x_axis) if stats is not None else None
+
+    if chart_type == "line":
+        return aggregate_line(df, x_axis, y_axis)
+    if chart_type == "scatter":
+        return aggregate_scatter(df, x_axis, y_axis)
+    if chart_type == "hist":
+        return aggregate_hist(df, x_axis, column)
+    if chart_type == "bar":
+        return aggregate_bar(df, x_axis, y_axis, options["limit"], column)
+    return aggregate_pie(df, x_axis, column)
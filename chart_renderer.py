@@ -0,0 +1,243 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from starlette.concurrency import run_in_threadpool
+
+# Worker processes (0 renders in the API process's thread pool instead)
+RENDER_WORKERS = int(os.getenv("DATANOVA_RENDER_WORKERS", str(os.cpu_count() or 2)))
+# Renders allowed to wait or run at once before new ones are rejected
+RENDER_QUEUE_SIZE = int(os.getenv("DATANOVA_RENDER_QUEUE_SIZE", str(max(RENDER_WORKERS, 1) * 4)))
+RENDER_TIMEOUT = float(os.getenv("DATANOVA_RENDER_TIMEOUT", "30"))
+
+CHART_TYPES = ["bar", "line", "scatter", "pie", "hist"]
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+}
+FULL_DPI = 150
+THUMBNAIL_DPI = int(os.getenv("DATANOVA_THUMBNAIL_DPI", "48"))
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue is at capacity"""
+
+
+class RenderTimeout(Exception):
+    """Raised when a single chart takes longer than its timeout"""
+
+
+# ---------------- CHART RENDERING (runs in workers) ---------------- #
+
+def render_chart(df: pd.DataFrame, config: dict) -> bytes:
+    """
+    Render one chart to image bytes (config "format" / "dpi", PNG at 150 dpi
+    by default) using only the object-oriented Figure API, so no pyplot or
+    global theme state is shared between renders.
+    """
+    chart_type = config["chart_type"]
+    x_axis = config["x_axis"]
+    y_axis = config.get("y_axis")
+    color = config.get("color", "#FF6B35")
+
+    with sns.axes_style(config.get("style", "darkgrid")), sns.plotting_context("notebook"):
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+
+        if config.get("aggregation"):
+            render_aggregated(fig, ax, df, config)
+
+        elif chart_type == "bar":
+            discrete = config.get("x_discrete")
+            if discrete is None:
+                discrete = df[x_axis].dtype == 'object' or df[x_axis].nunique() < 20
+            if discrete:
+                # Categorical x-axis
+                sns.barplot(data=df, x=x_axis, y=y_axis, color=color, ax=ax)
+                rotate_xticks(ax)
+            else:
+                # Numeric x-axis - group by bins
+                df_grouped = df.groupby(x_axis)[y_axis].mean().reset_index()
+                sns.barplot(data=df_grouped, x=x_axis, y=y_axis, color=color, ax=ax)
+
+        elif chart_type == "line":
+            sns.lineplot(data=df, x=x_axis, y=y_axis, marker="o", color=color, linewidth=2.5, ax=ax)
+            rotate_xticks(ax)
+
+        elif chart_type == "scatter":
+            sns.scatterplot(data=df, x=x_axis, y=y_axis, color=color, s=100, alpha=0.6, edgecolors='white', ax=ax)
+
+        elif chart_type == "pie":
+            value_counts = df[x_axis].value_counts().head(10)  # Top 10 categories
+            colors_list = sns.color_palette("husl", len(value_counts))
+            ax.pie(value_counts.values, labels=value_counts.index, autopct='%1.1f%%',
+                   colors=colors_list, startangle=90)
+            ax.axis('equal')
+
+        elif chart_type == "hist":
+            sns.histplot(df[x_axis], bins=30, color=color, kde=True, ax=ax)
+
+        else:
+            raise ValueError(f"Invalid chart type. Use: {', '.join(CHART_TYPES)}")
+
+        # Apply title and styling
+        ax.set_title(config.get("title", ""), fontsize=16, fontweight='bold', pad=20)
+
+        if chart_type != "pie":
+            ax.set_xlabel(x_axis, fontsize=12, fontweight='bold')
+            if y_axis:
+                ax.set_ylabel(y_axis, fontsize=12, fontweight='bold')
+            elif config.get("aggregation"):
+                ax.set_ylabel("count", fontsize=12, fontweight='bold')
+
+            if config.get("show_grid", True):
+                ax.grid(True, alpha=0.3)
+            else:
+                ax.grid(False)
+
+        fig.tight_layout()
+
+        buf = io.BytesIO()
+        fig.savefig(
+            buf,
+            format=config.get("format", "png"),
+            dpi=config.get("dpi", FULL_DPI),
+            bbox_inches='tight'
+        )
+        return buf.getvalue()
+
+
+def render_aggregated(fig, ax, df: pd.DataFrame, config: dict):
+    """Draw a frame pre-aggregated by chart_data.aggregate_chart_data"""
+    aggregation = config["aggregation"]
+    color = config.get("color", "#FF6B35")
+
+    if aggregation == "grouped" and config["chart_type"] == "bar":
+        sns.barplot(data=df, x="x", y="y", color=color, errorbar=None, ax=ax)
+        rotate_xticks(ax)
+
+    elif aggregation in ("grouped", "downsampled"):
+        sns.lineplot(data=df, x="x", y="y", color=color, linewidth=1.5, estimator=None, ax=ax)
+        rotate_xticks(ax)
+
+    elif aggregation == "points":
+        sns.scatterplot(data=df, x="x", y="y", color=color, s=20, alpha=0.5, edgecolors='none', ax=ax)
+
+    elif aggregation == "density":
+        bins = ax.hexbin(df["x"], df["y"], C=df["count"], reduce_C_function=np.sum,
+                         gridsize=50, cmap="rocket_r", mincnt=1)
+        fig.colorbar(bins, ax=ax, label="count")
+
+    elif aggregation == "binned":
+        ax.bar(df["left"], df["count"], width=df["right"] - df["left"], align="edge",
+               color=color, edgecolor="white", linewidth=0.5)
+
+    elif aggregation == "counts" and config["chart_type"] == "pie":
+        colors_list = sns.color_palette("husl", len(df))
+        ax.pie(df["count"], labels=df["x"], autopct='%1.1f%%', colors=colors_list, startangle=90)
+        ax.axis('equal')
+
+    elif aggregation == "counts":
+        sns.barplot(data=df, x="x", y="count", color=color, errorbar=None, ax=ax)
+        rotate_xticks(ax)
+
+    else:
+        raise ValueError(f"Unknown chart aggregation: {aggregation}")
+
+
+def rotate_xticks(ax):
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+
+
+def _warm_worker():
+    """Pay matplotlib/seaborn import and font cache costs once per worker"""
+    render_chart(pd.DataFrame({"x": [0, 1]}), {"chart_type": "hist", "x_axis": "x"})
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ---------------- RENDER ENGINE ---------------- #
+
+class ChartRenderEngine:
+    """
+    Pool of warm worker processes rendering charts off the event loop.
+    At most queue_size renders wait or run at once, and each render has
+    its own timeout. A timed-out render keeps its worker and its queue
+    slot until it finishes, but its caller is answered immediately.
+    """
+
+    def __init__(
+        self,
+        workers: int = RENDER_WORKERS,
+        queue_size: int = RENDER_QUEUE_SIZE,
+        timeout: float = RENDER_TIMEOUT
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.pending = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker
+            )
+        return self._pool
+
+    async def start(self):
+        """Spawn and warm every worker ahead of the first request"""
+        if self.workers > 0:
+            pool = self._ensure_pool()
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(pool, _ping) for _ in range(self.workers)])
+
+    async def render(self, df: pd.DataFrame, config: dict, timeout: Optional[float] = None) -> bytes:
+        if self.pending >= self.queue_size:
+            raise RenderQueueFull(f"Render queue is full ({self.queue_size} charts pending)")
+
+        if self.workers > 0:
+            loop = asyncio.get_running_loop()
+            job = asyncio.ensure_future(loop.run_in_executor(self._ensure_pool(), render_chart, df, config))
+        else:
+            job = asyncio.ensure_future(run_in_threadpool(render_chart, df, config))
+
+        # The slot is held until the render really ends, not until its caller gives up
+        self.pending += 1
+        job.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(job), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise RenderTimeout(f"Chart rendering exceeded {timeout or self.timeout:.0f}s")
+
+    def _release(self, job: asyncio.Future):
+        self.pending -= 1
+        if not job.cancelled():
+            job.exception()   # retrieved here, so failures of abandoned renders are not logged
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+chart_engine = ChartRenderEngine()
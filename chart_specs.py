@@ -0,0 +1,138 @@
+import pandas as pd
+
+SPEC_FORMATS = ["plotly", "vega-lite"]
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+
+# ---------------- HELPERS ---------------- #
+
+def column_values(series: pd.Series) -> list:
+    """JSON-ready list (NaN/NaT become null, dates become ISO strings)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if pd.isna(value) else value.isoformat() for value in series]
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def axis_type(series: pd.Series) -> str:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "temporal"
+    if pd.api.types.is_numeric_dtype(series):
+        return "quantitative"
+    return "nominal"
+
+
+# ---------------- PLOTLY ---------------- #
+
+def plotly_spec(df: pd.DataFrame, config: dict) -> dict:
+    """Plotly.js figure ({data, layout}) for an aggregated chart frame"""
+    aggregation, color = config["aggregation"], config.get("color", "#FF6B35")
+    chart_type = config["chart_type"]
+
+    if aggregation == "grouped" and chart_type == "bar":
+        trace = {"type": "bar", "x": column_values(df["x"]), "y": column_values(df["y"]), "marker": {"color": color}}
+    elif aggregation in ("grouped", "downsampled"):
+        trace = {"type": "scattergl", "mode": "lines", "x": column_values(df["x"]), "y": column_values(df["y"]),
+                 "line": {"color": color, "width": 2}}
+    elif aggregation == "points":
+        trace = {"type": "scattergl", "mode": "markers", "x": column_values(df["x"]), "y": column_values(df["y"]),
+                 "marker": {"color": color, "opacity": 0.6}}
+    elif aggregation == "density":
+        trace = {"type": "scattergl", "mode": "markers", "x": column_values(df["x"]), "y": column_values(df["y"]),
+                 "marker": {"color": column_values(df["count"]), "colorscale": "Inferno", "reversescale": True,
+                            "symbol": "square", "showscale": True, "colorbar": {"title": {"text": "count"}}}}
+    elif aggregation == "binned":
+        trace = {"type": "bar", "x": column_values((df["left"] + df["right"]) / 2), "y": column_values(df["count"]),
+                 "width": column_values(df["right"] - df["left"]), "marker": {"color": color}}
+    elif chart_type == "pie":
+        trace = {"type": "pie", "labels": column_values(df["x"]), "values": column_values(df["count"])}
+    else:
+        trace = {"type": "bar", "x": column_values(df["x"]), "y": column_values(df["count"]), "marker": {"color": color}}
+
+    layout = {"title": {"text": config.get("title", "")}}
+    if chart_type != "pie":
+        show_grid = config.get("show_grid", True)
+        layout["xaxis"] = {"title": {"text": config["x_axis"]}, "showgrid": show_grid}
+        layout["yaxis"] = {"title": {"text": config.get("y_axis") or "count"}, "showgrid": show_grid}
+        if aggregation == "binned":
+            layout["bargap"] = 0
+
+    return {"data": [trace], "layout": layout}
+
+
+# ---------------- VEGA-LITE ---------------- #
+
+def vega_lite_spec(df: pd.DataFrame, config: dict) -> dict:
+    """Vega-Lite v5 spec with the aggregated rows inlined"""
+    aggregation, color = config["aggregation"], config.get("color", "#FF6B35")
+    chart_type = config["chart_type"]
+    x_title, y_title = config["x_axis"], config.get("y_axis") or "count"
+
+    if aggregation == "grouped" and chart_type == "bar":
+        mark = {"type": "bar", "color": color}
+        encoding = {
+            "x": {"field": "x", "type": "nominal", "sort": None, "title": x_title},
+            "y": {"field": "y", "type": "quantitative", "title": y_title},
+        }
+    elif aggregation in ("grouped", "downsampled"):
+        mark = {"type": "line", "color": color}
+        x_type = "ordinal" if aggregation == "grouped" else axis_type(df["x"])
+        encoding = {
+            "x": {"field": "x", "type": x_type, "title": x_title},
+            "y": {"field": "y", "type": "quantitative", "title": y_title},
+        }
+    elif aggregation == "points":
+        mark = {"type": "circle", "color": color, "opacity": 0.6}
+        encoding = {
+            "x": {"field": "x", "type": "quantitative", "title": x_title},
+            "y": {"field": "y", "type": "quantitative", "title": y_title},
+        }
+    elif aggregation == "density":
+        mark = {"type": "square"}
+        encoding = {
+            "x": {"field": "x", "type": "quantitative", "title": x_title},
+            "y": {"field": "y", "type": "quantitative", "title": y_title},
+            "color": {"field": "count", "type": "quantitative", "scale": {"scheme": "inferno", "reverse": True}},
+        }
+    elif aggregation == "binned":
+        mark = {"type": "bar", "color": color}
+        encoding = {
+            "x": {"field": "left", "type": "quantitative", "bin": {"binned": True}, "title": x_title},
+            "x2": {"field": "right"},
+            "y": {"field": "count", "type": "quantitative", "title": "count"},
+        }
+    elif chart_type == "pie":
+        mark = {"type": "arc"}
+        encoding = {
+            "theta": {"field": "count", "type": "quantitative"},
+            "color": {"field": "x", "type": "nominal", "title": x_title},
+        }
+    else:
+        mark = {"type": "bar", "color": color}
+        encoding = {
+            "x": {"field": "x", "type": "nominal", "sort": None, "title": x_title},
+            "y": {"field": "count", "type": "quantitative", "title": "count"},
+        }
+
+    columns = {col: column_values(df[col]) for col in df.columns}
+    records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    spec = {
+        "$schema": VEGA_LITE_SCHEMA,
+        "title": config.get("title", ""),
+        "width": "container",
+        "height": 400,
+        "data": {"values": records},
+        "mark": mark,
+        "encoding": encoding,
+        "config": {"axis": {"grid": config.get("show_grid", True)}},
+    }
+    if encoding.get("x", {}).get("type") in ("quantitative", "temporal"):
+        # Scroll to zoom, drag to pan
+        spec["params"] = [{"name": "zoom", "select": "interval", "bind": "scales"}]
+    return spec
+
+
+def build_chart_spec(df: pd.DataFrame, config: dict) -> dict:
+    """Client-side chart spec in config["spec_format"] for an aggregated frame"""
+    if config["spec_format"] == "vega-lite":
+        return vega_lite_spec(df, config)
+    return plotly_spec(df, config)
@@ -0,0 +1,112 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+from datasets import DatasetEntry
+
+# Sessions idle for longer than this are dropped; the store never holds more than the max
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("DATANOVA_CHAT_SESSION_TTL", "1800"))
+CHAT_SESSION_MAX = int(os.getenv("DATANOVA_CHAT_SESSIONS", "1000"))
+# Previous question/answer pairs sent back to the LLM with each new question
+CHAT_HISTORY_TURNS = int(os.getenv("DATANOVA_CHAT_HISTORY_TURNS", "6"))
+
+
+# ---------------- SESSION ---------------- #
+
+class ChatSession:
+    """
+    One conversation about one dataset. Holds the dataset_id (not the frame,
+    so the registry can still evict it), the chat sample and prompt context
+    (built once, on the first question that needs them) and the conversation
+    history, so follow-ups only send the question.
+    """
+
+    def __init__(self, entry: DatasetEntry, mode: str = "Normal", stratify: Optional[str] = None):
+        self.session_id = secrets.token_urlsafe(16)
+        self.dataset_id = entry.dataset_id
+        self.filename = entry.filename
+        self.mode = mode
+        self.stratify = stratify
+        self.sample: Optional[pd.DataFrame] = None
+        self.context: Optional[str] = None
+        self.history: list[dict] = []
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self._lock = threading.Lock()
+
+    def recent_history(self, turns: int = CHAT_HISTORY_TURNS) -> list[dict]:
+        with self._lock:
+            return list(self.history[-2 * turns:]) if turns > 0 else []
+
+    def record(self, question: str, answer: str, mode: str):
+        """Store a finished turn (question and answer are added together)"""
+        with self._lock:
+            self.history.append({"role": "user", "content": question})
+            self.history.append({"role": "assistant", "content": answer, "mode": mode})
+
+    def info(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "dataset_id": self.dataset_id,
+            "filename": self.filename,
+            "mode": self.mode,
+            "stratify": self.stratify,
+            "turns": len(self.history) // 2,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+        }
+
+
+# ---------------- SESSION STORE ---------------- #
+
+class ChatSessionStore:
+    """In-memory sessions ordered by last use, evicted after CHAT_SESSION_TTL_SECONDS idle"""
+
+    def __init__(self, ttl: float = CHAT_SESSION_TTL_SECONDS, max_sessions: int = CHAT_SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now: float):
+        # Least recently used first, so stop at the first live session
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def add(self, session: ChatSession) -> ChatSession:
+        with self._lock:
+            self._evict_idle(time.time())
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict_idle(time.time())
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, "ttl_seconds": self.ttl}
+
+
+chat_sessions = ChatSessionStore()
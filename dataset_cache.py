@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - cache is simply disabled without pyarrow
+    pa = None
+    feather = None
+
+# Location and size budget of the on-disk parsed-dataset cache (0 disables it)
+DISK_CACHE_DIR = os.getenv(
+    "DATANOVA_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "datanova", "datasets")
+)
+DISK_CACHE_MAX_BYTES = int(os.getenv("DATANOVA_DISK_CACHE_MB", "4096")) * 1024 * 1024
+
+FILENAME_METADATA_KEY = b"datanova.filename"
+
+
+# ---------------- FEATHER DATASET CACHE ---------------- #
+
+class FeatherCache:
+    """
+    Parsed datasets stored as uncompressed Arrow IPC (Feather v2) files named
+    by dataset_id. Uncompressed files can be memory-mapped on reload, so
+    numeric columns come back without copying and without re-running
+    pd.read_csv, including after a process restart.
+    Eviction removes the least recently read files once the budget is exceeded.
+    """
+
+    def __init__(self, directory: str = DISK_CACHE_DIR, max_bytes: int = DISK_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = feather is not None and max_bytes > 0
+        self._lock = threading.Lock()
+
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, dataset_id: str) -> str:
+        return os.path.join(self.directory, f"{dataset_id}.feather")
+
+    def load(self, dataset_id: str) -> Optional[tuple[pd.DataFrame, str]]:
+        """Return (df, filename) for a cached dataset, or None"""
+        if not self.enabled:
+            return None
+
+        path = self._path(dataset_id)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            table = feather.read_table(path, memory_map=True)
+            metadata = table.schema.metadata or {}
+            filename = metadata.get(FILENAME_METADATA_KEY, b"dataset.csv").decode("utf-8")
+            df = table.to_pandas(split_blocks=True)
+
+            # Mark as recently used for eviction
+            os.utime(path)
+            return df, filename
+
+        except Exception as e:
+            print(f"Dataset cache read error ({dataset_id}): {e}")
+            self._remove(path)
+            return None
+
+    def store(self, dataset_id: str, df: pd.DataFrame, filename: str) -> bool:
+        if not self.enabled:
+            return False
+
+        path = self._path(dataset_id)
+        if os.path.exists(path):
+            os.utime(path)
+            return True
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[FILENAME_METADATA_KEY] = filename.encode("utf-8")
+            table = table.replace_schema_metadata(metadata)
+
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+
+        except Exception as e:
+            # Columns Arrow cannot represent (e.g. mixed object types) just skip the cache
+            print(f"Dataset cache write error ({dataset_id}): {e}")
+            self._remove(tmp_path)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """Delete least recently used files until the cache fits its budget"""
+        with self._lock:
+            files = self._files()
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def contains(self, dataset_id: str) -> bool:
+        return self.enabled and os.path.exists(self._path(dataset_id))
+
+    def remove(self, dataset_id: str):
+        if self.enabled:
+            self._remove(self._path(dataset_id))
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+
+        files = self._files()
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "datasets": len(files),
+            "disk_bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every cached dataset file"""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".feather"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+disk_cache = FeatherCache()
@@ -0,0 +1,647 @@
+import asyncio
+import codecs
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+
+import pandas as pd
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from dataset_cache import disk_cache
+from dtype_optimizer import optimize_dtypes
+from profiler import DatasetProfile, frame_column_info, profile_dataset
+from retrieval import RetrievalIndex
+from sampling import dataset_seed, frame_reservoir
+
+router = APIRouter()
+
+# Upper bound for parsed frames kept in memory (deep memory usage)
+DATASET_CACHE_MAX_BYTES = int(os.getenv("DATANOVA_DATASET_CACHE_MB", "1024")) * 1024 * 1024
+
+# Streamed uploads are kept for the registry only while their parsed chunks stay under this size
+STREAM_RETAIN_MAX_BYTES = int(os.getenv("DATANOVA_STREAM_RETAIN_MB", "256")) * 1024 * 1024
+STREAM_CHUNK_ROWS = int(os.getenv("DATANOVA_CSV_CHUNK_ROWS", "50000"))
+HASH_BLOCK_BYTES = 1024 * 1024
+# Bytes / lines looked at to guess a CSV's encoding and delimiter
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 20
+CSV_DELIMITERS = [",", ";", "\t", "|"]
+# Rows parsed to infer column types when the full file is not needed
+SCHEMA_ROWS = 1000
+# Request body bytes buffered ahead of the parser for streamed uploads
+UPLOAD_PIPE_MAX_BYTES = int(os.getenv("DATANOVA_UPLOAD_BUFFER_MB", "8")) * 1024 * 1024
+
+DATASET_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+# ---------------- DATASET ENTRY ---------------- #
+
+class DatasetEntry:
+    """A parsed dataset identified by the hash of its raw CSV content"""
+
+    def __init__(
+        self,
+        dataset_id: str,
+        filename: str,
+        df: pd.DataFrame,
+        stats: Optional[DatasetProfile] = None,
+        dtype_report: Optional[dict] = None
+    ):
+        self.dataset_id = dataset_id
+        self.filename = filename
+        self.df = df
+        self.dtype_report = dtype_report
+        self.size_bytes = int(df.memory_usage(deep=True).sum())
+        self.created_at = time.time()
+        self._stats = stats
+        self._stats_lock = threading.Lock()
+        self._retrieval_index: Optional[RetrievalIndex] = None
+        self._retrieval_lock = threading.Lock()
+
+    @property
+    def stats(self) -> DatasetProfile:
+        """
+        Column statistics index (dtypes, nulls, moments, distinct and top
+        values). Built once per dataset and shared by every endpoint.
+        """
+        if self._stats is None:
+            with self._stats_lock:
+                if self._stats is None:
+                    self._stats = profile_dataset(self.df, seed=dataset_seed(self.dataset_id))
+        return self._stats
+
+    @property
+    def retrieval_index(self) -> RetrievalIndex:
+        """
+        BM25 index over the rows, built on first use (chat) and then shared.
+        Its memory counts toward the entry's size in the registry budget.
+        """
+        if self._retrieval_index is None:
+            with self._retrieval_lock:
+                if self._retrieval_index is None:
+                    index = RetrievalIndex.build(self.df)
+                    registry.grow(self, index.nbytes)
+                    self._retrieval_index = index
+        return self._retrieval_index
+
+    def column_info(self) -> dict:
+        return self.stats.column_info()
+
+    def info(self) -> dict:
+        return {
+            "dataset_id": self.dataset_id,
+            "fileName": self.filename,
+            "row_count": len(self.df),
+            "column_count": len(self.df.columns),
+            "columns": self.df.columns.tolist(),
+            "memory_bytes": self.size_bytes,
+            "dtype_optimization": self.dtype_report,
+        }
+
+
+class DatasetProjection(DatasetEntry):
+    """
+    Some columns (and possibly only the leading rows) of an upload, parsed
+    for one request and never registered. Column lists for the dropdowns
+    come from the dtypes of the file's first rows (`schema`).
+    """
+
+    def __init__(self, dataset_id: str, filename: str, df: pd.DataFrame, schema: pd.DataFrame):
+        super().__init__(dataset_id, filename, df)
+        self.schema = schema
+
+    def column_info(self) -> dict:
+        return frame_column_info(self.schema)
+
+
+# ---------------- LRU REGISTRY ---------------- #
+
+class DatasetRegistry:
+    """
+    In-memory LRU of parsed datasets, bounded by total frame size (plus
+    the retrieval indexes built for them).
+    Frames handed out by the registry are shared between requests and
+    must not be modified in place.
+    """
+
+    def __init__(self, max_bytes: int = DATASET_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, DatasetEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, dataset_id: str) -> Optional[DatasetEntry]:
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is not None:
+                self._entries.move_to_end(dataset_id)
+            return entry
+
+    def put(self, entry: DatasetEntry) -> bool:
+        """Store an entry, evicting least recently used ones. Returns False if it can never fit."""
+        if entry.size_bytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(entry.dataset_id, None)
+            if old is not None:
+                self.total_bytes -= old.size_bytes
+
+            while self._entries and self.total_bytes + entry.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size_bytes
+
+            self._entries[entry.dataset_id] = entry
+            self.total_bytes += entry.size_bytes
+            return True
+
+    def grow(self, entry: DatasetEntry, extra_bytes: int):
+        """Count memory an entry gained after it was stored (its retrieval index) and re-check the budget"""
+        with self._lock:
+            entry.size_bytes += extra_bytes
+            if self._entries.get(entry.dataset_id) is not entry:
+                return
+            self.total_bytes += extra_bytes
+
+            # Least recently used first; the entry that grew is in use and stays
+            for dataset_id in list(self._entries):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if dataset_id != entry.dataset_id:
+                    self.total_bytes -= self._entries.pop(dataset_id).size_bytes
+
+    def remove(self, dataset_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(dataset_id, None)
+            if entry is None:
+                return False
+            self.total_bytes -= entry.size_bytes
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "datasets": len(self._entries),
+                "memory_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [entry.info() for entry in reversed(self._entries.values())]
+
+
+registry = DatasetRegistry()
+
+
+# ---------------- CSV LOADER ---------------- #
+
+def sniff_csv(sample: bytes) -> dict:
+    """
+    read_csv options (encoding, delimiter) guessed from the first bytes of
+    a file. The delimiter is the candidate that splits every sampled line
+    into the same number (> 1) of fields; comma wins ties.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    elif sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = "utf-16"
+    else:
+        encoding = "utf-8"
+        try:
+            sample.decode("utf-8")
+        except UnicodeDecodeError as e:
+            # A character cut off at the end of the sample is still UTF-8
+            if e.start < len(sample) - 3:
+                encoding = "cp1252"
+
+    text = sample.decode(encoding, errors="replace")
+    lines = text.splitlines()[:SNIFF_LINES]
+    if len(lines) > 1 and not text.endswith(("\n", "\r")):
+        lines = lines[:-1]   # the last line may be cut off
+
+    best, best_fields = ",", 1
+    for delimiter in CSV_DELIMITERS:
+        counts = {len(row) for row in csv.reader(lines, delimiter=delimiter) if row}
+        fields = counts.pop() if len(counts) == 1 else 0
+        if fields > best_fields:
+            best, best_fields = delimiter, fields
+    return {"encoding": encoding, "sep": best}
+
+
+def read_csv(
+    fileobj,
+    usecols: Optional[list[str]] = None,
+    nrows: Optional[int] = None,
+    chunksize: Optional[int] = None
+):
+    """
+    Shared CSV loader for every router: sniffs the encoding and delimiter,
+    strips header names and pushes column projection (usecols, matched
+    against the stripped names; unknown names are ignored) and row limits
+    (nrows) into the parser. Returns a frame, or an iterator of frames
+    when chunksize is given.
+    """
+    if fileobj.seekable():
+        start = fileobj.tell()
+        sample = fileobj.read(SNIFF_BYTES)
+        fileobj.seek(start)
+        stream = fileobj
+    else:
+        stream = io.BufferedReader(fileobj, SNIFF_BYTES)
+        sample = stream.peek(SNIFF_BYTES)
+
+    wanted = set(usecols) if usecols is not None else None
+    parsed = pd.read_csv(
+        stream,
+        **sniff_csv(sample),
+        usecols=(lambda name: name.strip() in wanted) if wanted is not None else None,
+        nrows=nrows,
+        chunksize=chunksize,
+    )
+
+    if chunksize is None:
+        return strip_columns(parsed)
+    return (strip_columns(chunk) for chunk in parsed)
+
+
+def strip_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def read_schema(fileobj, rows: int = SCHEMA_ROWS) -> pd.DataFrame:
+    """The first `rows` rows of every column; enough to tell numeric from text columns"""
+    return read_csv(fileobj, nrows=rows)
+
+
+def load_projection(
+    fileobj,
+    filename: str,
+    dataset_id: str,
+    columns: list[str],
+    nrows: Optional[int] = None
+) -> DatasetProjection:
+    """
+    Parse only `columns` (and the first `nrows` rows) of an uploaded file,
+    with the same dtypes the registered dataset would get
+    """
+    fileobj.seek(0)
+    schema = read_schema(fileobj)
+    fileobj.seek(0)
+    df, _ = optimize_dtypes(read_csv(fileobj, usecols=columns, nrows=nrows))
+    return DatasetProjection(dataset_id, filename, df, schema)
+
+
+# ---------------- PARSING & LOOKUP ---------------- #
+
+def hash_stream(fileobj, block_size: int = HASH_BLOCK_BYTES) -> str:
+    """
+    Content-addressed id: identical uploads always map to the same dataset.
+    Reads the whole file in blocks and rewinds it for the parser.
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def scan_stream(fileobj, block_size: int = HASH_BLOCK_BYTES) -> tuple[str, int]:
+    """
+    (dataset id, data rows) in one pass over the raw bytes, rewinding the
+    file. Rows are counted as newlines (bytes.count runs in C over each
+    block) minus the header, so quoted values that contain line breaks
+    are counted as extra rows.
+    """
+    digest, lines, last = hashlib.sha256(), 0, b""
+    fileobj.seek(0)
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        digest.update(block)
+        lines += block.count(b"\n")
+        last = block[-1:]
+    fileobj.seek(0)
+
+    if last and last != b"\n":
+        lines += 1   # last line without a trailing newline
+    return digest.hexdigest(), max(lines - 1, 0)
+
+
+def load_cached(dataset_id: str) -> Optional[DatasetEntry]:
+    """Look a dataset up in memory first, then in the on-disk columnar cache"""
+    if not DATASET_ID_PATTERN.match(dataset_id):
+        return None
+
+    entry = registry.get(dataset_id)
+    if entry is not None:
+        return entry
+
+    cached = disk_cache.load(dataset_id)
+    if cached is None:
+        return None
+
+    df, filename = cached
+    # Cached files written since dtype optimization are already compact
+    df, report = optimize_dtypes(df)
+    entry = DatasetEntry(dataset_id, filename, df, dtype_report=report)
+    registry.put(entry)
+    return entry
+
+
+def register_stream(fileobj, filename: str, dataset_id: Optional[str] = None) -> DatasetEntry:
+    """
+    Return the registered dataset for an uploaded file, parsing it in chunks
+    only on first sight. The raw upload is never held in memory as a whole.
+    """
+    dataset_id = dataset_id or hash_stream(fileobj)
+
+    entry = load_cached(dataset_id)
+    if entry is not None:
+        return entry
+
+    _, entry, _ = ingest_stream(fileobj, filename, retain_max_bytes=None, dataset_id=dataset_id)
+    return entry
+
+
+class HashingReader(io.RawIOBase):
+    """Readable wrapper that hashes the raw bytes as pandas consumes them"""
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._hash = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._file.read(len(buffer))
+        self._hash.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def hexdigest(self) -> str:
+        # Hash whatever the parser did not need to read
+        while self.read(1024 * 1024):
+            pass
+        return self._hash.hexdigest()
+
+
+def ingest_stream(
+    fileobj,
+    filename: str,
+    chunksize: int = STREAM_CHUNK_ROWS,
+    progress: Optional[Callable[[int], None]] = None,
+    retain_max_bytes: Optional[int] = STREAM_RETAIN_MAX_BYTES,
+    dataset_id: Optional[str] = None
+) -> tuple[str, Optional[DatasetEntry], DatasetProfile]:
+    """
+    Parse a CSV stream chunk by chunk, profiling every chunk and hashing
+    the raw bytes on the same pass. The parsed chunks are registered as a
+    dataset only while they fit in retain_max_bytes (None: always), so
+    files larger than that are processed in constant memory.
+    progress, if given, is called with the rows parsed so far after each chunk.
+    A caller that already hashed the file passes its dataset_id to skip hashing.
+    Returns (dataset_id, entry or None if the dataset was not retained, profile).
+    """
+    reader = HashingReader(fileobj) if dataset_id is None else fileobj
+    seeded = dataset_id is not None
+    profile = DatasetProfile(dataset_seed(dataset_id))
+    retained, retained_bytes = [], 0
+
+    for chunk in read_csv(reader, chunksize=chunksize):
+        profile.update(chunk)
+        if progress is not None:
+            progress(profile.rows)
+
+        if retained is not None:
+            retained_bytes += int(chunk.memory_usage(deep=True).sum())
+            if retain_max_bytes is None or retained_bytes <= retain_max_bytes:
+                retained.append(chunk)
+            else:
+                retained = None
+
+    if dataset_id is None:
+        dataset_id = reader.hexdigest()
+
+    entry = load_cached(dataset_id)
+    if entry is None and retained:
+        df = pd.concat(retained, ignore_index=True) if len(retained) > 1 else retained[0]
+        df, report = optimize_dtypes(df)
+        if not seeded:
+            # The content hash is known only now; sample the rows this dataset's seed picks
+            profile.reservoir = frame_reservoir(df, seed=dataset_seed(dataset_id))
+        entry = DatasetEntry(dataset_id, filename, df, profile, report)
+        registry.put(entry)
+        disk_cache.store(dataset_id, df, filename)
+
+    return dataset_id, entry, profile
+
+
+class UploadPipe(io.RawIOBase):
+    """
+    Blocking reader over request body chunks pushed from the event loop,
+    so a parser thread consumes an upload while it is still arriving.
+    At most max_bytes are buffered ahead of the parser.
+    """
+
+    def __init__(self, max_bytes: int = UPLOAD_PIPE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._chunks: deque = deque()
+        self._buffered = 0
+        self._finished = False
+        self._aborted = False
+        self._reader_done = False
+        self._cond = threading.Condition()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with self._cond:
+            while not self._chunks and not self._finished and not self._aborted:
+                self._cond.wait()
+            if self._aborted:
+                raise IOError("Upload aborted before the body was complete")
+            if not self._chunks:
+                return 0
+
+            chunk = self._chunks[0]
+            size = min(len(buffer), len(chunk))
+            buffer[:size] = chunk[:size]
+            if size == len(chunk):
+                self._chunks.popleft()
+            else:
+                self._chunks[0] = chunk[size:]
+            self._buffered -= size
+            self._cond.notify_all()
+            return size
+
+    def feed(self, data: bytes) -> bool:
+        """Queue a body chunk without blocking; False once the buffer is full"""
+        with self._cond:
+            if data:
+                self._chunks.append(memoryview(data))
+                self._buffered += len(data)
+                self._cond.notify_all()
+            return self._buffered < self.max_bytes
+
+    def wait_for_room(self):
+        with self._cond:
+            while self._buffered >= self.max_bytes and not self._reader_done:
+                self._cond.wait()
+
+    def finish(self):
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def abort(self):
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+    def reader_done(self):
+        with self._cond:
+            self._reader_done = True
+            self._cond.notify_all()
+
+
+def parse_pipe(pipe: UploadPipe, filename: str) -> DatasetEntry:
+    try:
+        _, entry, _ = ingest_stream(pipe, filename, retain_max_bytes=None)
+        return entry
+    finally:
+        pipe.reader_done()   # a producer waiting for buffer room must not wait forever
+
+
+async def ingest_request_body(request: Request, filename: str) -> DatasetEntry:
+    """
+    Parse, profile and hash a raw CSV request body in one pass that
+    overlaps with the network transfer; only a bounded window of raw
+    bytes is held at any time.
+    """
+    pipe = UploadPipe()
+    parsing = asyncio.ensure_future(run_in_threadpool(parse_pipe, pipe, filename))
+    try:
+        async for data in request.stream():
+            if parsing.done():
+                break   # the parser failed; its error is raised below
+            if not pipe.feed(data):
+                await run_in_threadpool(pipe.wait_for_room)
+    except BaseException:
+        # Client went away mid-upload: never register a truncated dataset
+        pipe.abort()
+        await asyncio.gather(parsing, return_exceptions=True)
+        raise
+
+    pipe.finish()
+    return await parsing
+
+
+def get_dataset(dataset_id: str) -> DatasetEntry:
+    entry = load_cached(dataset_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown dataset_id: {dataset_id}. Upload the file again via /api/datasets"
+        )
+    return entry
+
+
+async def resolve_dataset(
+    file: Optional[UploadFile] = None,
+    dataset_id: Optional[str] = None
+) -> DatasetEntry:
+    """
+    Shared input handling for every endpoint: prefer a registered
+    dataset_id, otherwise parse (and register) the uploaded file.
+    """
+    if dataset_id:
+        return get_dataset(dataset_id)
+
+    if file is None:
+        raise HTTPException(status_code=400, detail="Provide either a file or a dataset_id")
+
+    return await run_in_threadpool(register_stream, file.file, file.filename or "dataset.csv")
+
+
+# ---------------- DATASET ENDPOINTS ---------------- #
+
+@router.post("/datasets")
+async def upload_dataset(file: UploadFile = File(...)):
+    """
+    Upload a CSV once and get back a dataset_id that can be passed
+    to /summary, /visualize, /analyze-columns and /chat instead of the file
+    """
+    if not file.filename or not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported")
+
+    try:
+        entry = await resolve_dataset(file=file)
+        return {"success": True, **entry.info()}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error registering dataset: {str(e)}")
+
+
+@router.post("/datasets/stream")
+async def upload_dataset_stream(request: Request, filename: str = "dataset.csv"):
+    """
+    Upload a CSV as the raw request body (e.g. Content-Type: text/csv).
+    The body is parsed while it arrives instead of after the transfer,
+    and the raw file is never held in memory as a whole.
+    """
+    if not filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported")
+
+    try:
+        entry = await ingest_request_body(request, filename)
+        return {"success": True, **entry.info()}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error registering dataset: {str(e)}")
+
+
+@router.get("/datasets")
+def list_datasets():
+    """List datasets currently held in memory"""
+    return {
+        "success": True,
+        "datasets": registry.list(),
+        "cache": registry.stats(),
+        "disk_cache": disk_cache.stats()
+    }
+
+
+@router.get("/datasets/{dataset_id}")
+def dataset_info(dataset_id: str):
+    entry = get_dataset(dataset_id)
+    return {"success": True, **entry.info(), "column_stats": entry.stats.column_stats()}
+
+
+@router.delete("/datasets/{dataset_id}")
+def delete_dataset(dataset_id: str):
+    if not DATASET_ID_PATTERN.match(dataset_id):
+        raise HTTPException(status_code=404, detail=f"Unknown dataset_id: {dataset_id}")
+    if not registry.remove(dataset_id) and not disk_cache.contains(dataset_id):
+        raise HTTPException(status_code=404, detail=f"Unknown dataset_id: {dataset_id}")
+    disk_cache.remove(dataset_id)
+    return {"success": True, "dataset_id": dataset_id}
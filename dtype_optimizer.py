@@ -0,0 +1,125 @@
+import os
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (backs the compact string dtype)
+    ARROW_STRING = pd.StringDtype("pyarrow", na_value=np.nan)
+except ImportError:  # pragma: no cover - object columns are left as they are
+    ARROW_STRING = None
+
+# Set DATANOVA_OPTIMIZE_DTYPES=0 to keep frames exactly as read_csv returns them
+OPTIMIZE_DTYPES = os.getenv("DATANOVA_OPTIMIZE_DTYPES", "1") != "0"
+# Text columns become categories when at most this share of their values are distinct
+CATEGORY_MAX_RATIO = 0.5
+# Only ISO 8601 dates are parsed; day/month order in 01/02/2024 is ambiguous
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$")
+DATE_SAMPLE_ROWS = 100
+
+
+# ---------------- COLUMN CONVERSIONS ---------------- #
+
+def is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def downcast_numbers(series: pd.Series) -> pd.Series:
+    """Smallest integer type holding every value; float32 only when no value changes"""
+    if not isinstance(series.dtype, np.dtype) or pd.api.types.is_bool_dtype(series):
+        return series
+
+    if series.dtype.kind in "iu":
+        return pd.to_numeric(series, downcast="integer")
+
+    if series.dtype == np.float64:
+        values = series.to_numpy()
+        with np.errstate(over="ignore"):
+            narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return pd.Series(narrow, index=series.index, name=series.name)
+    return series
+
+
+def parse_iso_dates(series: pd.Series) -> pd.Series:
+    """datetime64 for a text column whose every value is an ISO 8601 date, else the column"""
+    values = series.dropna()
+    if values.empty:
+        return series
+
+    sample = values.head(DATE_SAMPLE_ROWS).astype(str)
+    if not all(ISO_DATE.match(value) for value in sample):
+        return series
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    return parsed if parsed.notna().sum() == len(values) else series
+
+
+def compact_text(series: pd.Series) -> pd.Series:
+    """Category for repetitive text, Arrow-backed strings for the rest"""
+    if series.count() and series.nunique() <= CATEGORY_MAX_RATIO * series.count():
+        return series.astype("category")
+    if ARROW_STRING is not None and pd.api.types.is_object_dtype(series):
+        values = series.dropna()
+        if values.map(type).eq(str).all():
+            return series.astype(ARROW_STRING)
+    return series
+
+
+def optimize_series(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series):
+        return downcast_numbers(series)
+    if is_text(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        parsed = parse_iso_dates(series)
+        return parsed if parsed is not series else compact_text(series)
+    return series
+
+
+# ---------------- FRAME ---------------- #
+
+def optimize_dtypes(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    Memory-compact copy of a freshly parsed frame and a report of what
+    changed. A conversion is kept only if it shrinks the column, except
+    dates, which are kept as datetimes so charts and filters see real dates.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    if not OPTIMIZE_DTYPES:
+        return df, {"before_bytes": before, "after_bytes": before, "columns": {}}
+
+    optimized = df.copy(deep=False)
+    changes = {}
+    for position, name in enumerate(df.columns):
+        series = df.iloc[:, position]
+        converted = optimize_series(series)
+        if converted is series or converted.dtype == series.dtype:
+            continue
+
+        size = int(series.memory_usage(deep=True, index=False))
+        new_size = int(converted.memory_usage(deep=True, index=False))
+        if new_size >= size and not pd.api.types.is_datetime64_any_dtype(converted):
+            continue
+
+        optimized.isetitem(position, converted)
+        changes[str(name)] = {"from": str(series.dtype), "to": str(converted.dtype), "saved_bytes": size - new_size}
+
+    after = int(optimized.memory_usage(deep=True).sum())
+    return optimized, {"before_bytes": before, "after_bytes": after, "columns": changes}
+
+
+def plain_values(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Categories back to ordinary columns, for small frames handed to
+    renderers (seaborn and pie labels would otherwise show unused categories)
+    """
+    categorical = [name for name, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    df = df.copy(deep=False)
+    for name in categorical:
+        df[name] = df[name].astype(df[name].cat.categories.dtype)
+    return df
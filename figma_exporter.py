@@ -1,6 +1,8 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 
+from profiler import DatasetProfile, frame_column_info
+
 
 def generate_figma_design_spec(data_dict: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -54,14 +56,23 @@ def generate_figma_design_spec(data_dict: Dict[str, Any]) -> Dict[str, Any]:
     return spec
 
 
-def create_export_metadata(df: pd.DataFrame) -> Dict[str, Any]:
+def create_export_metadata(df: pd.DataFrame, stats: Optional[DatasetProfile] = None) -> Dict[str, Any]:
     """
     Extract column metadata for advanced Figma table components.
+    Pass the dataset's column stats index (DatasetEntry.stats) for CSV dtypes;
+    without it the frame's dtypes are used, without scanning the rows.
     """
+    if stats is not None:
+        column_info = stats.column_info()
+        data_types = {name: col.dtype for name, col in stats.columns.items()}
+    else:
+        column_info = frame_column_info(df)
+        data_types = {str(name): str(dtype) for name, dtype in df.dtypes.items()}
+
     return {
-        "columns": df.columns.tolist(),
+        "columns": column_info["all_columns"],
         "sample_size": int(len(df.head(5))),
-        "data_types": df.dtypes.astype(str).to_dict(),
-        "numeric_columns": df.select_dtypes(include=["number"]).columns.tolist(),
-        "categorical_columns": df.select_dtypes(include=["object"]).columns.tolist()
+        "data_types": data_types,
+        "numeric_columns": column_info["numeric_columns"],
+        "categorical_columns": column_info["categorical_columns"]
     }
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+# Jobs processed at once, jobs allowed to wait, and how long finished jobs stay pollable
+JOB_WORKERS = int(os.getenv("DATANOVA_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("DATANOVA_JOB_QUEUE_SIZE", "32"))
+JOB_TTL_SECONDS = float(os.getenv("DATANOVA_JOB_TTL", "3600"))
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_QUEUE_SIZE jobs are already waiting"""
+
+
+# ---------------- JOB ---------------- #
+
+class Job:
+    """
+    One unit of background work with pollable progress. Progress may be
+    updated from worker threads; subscribers on the event loop are woken
+    on every change. `cleanup` releases what the job holds (e.g. a spooled
+    upload) and runs once however the job ends, even if it never ran.
+    """
+
+    def __init__(self, kind: str, loop: asyncio.AbstractEventLoop, cleanup: Optional[Callable[[], None]] = None):
+        self.job_id = secrets.token_urlsafe(12)
+        self.kind = kind
+        self.status = "queued"
+        self.progress: dict = {"stage": "queued"}
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+        self._loop = loop
+        self._changed = asyncio.Event()
+        self._lock = threading.Lock()
+        self._cleanup = cleanup
+
+    def update(self, **progress):
+        """Merge progress fields (thread-safe) and wake subscribers"""
+        with self._lock:
+            self.progress = {**self.progress, **progress}
+            self.updated_at = time.time()
+        self._loop.call_soon_threadsafe(self._notify)
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+        self.update(stage="running")
+
+    def finish(self, status: str, result=None, error: Optional[str] = None):
+        with self._lock:
+            self.status, self.result, self.error = status, result, error
+            self.progress = {**self.progress, "stage": status}
+            self.updated_at = time.time()
+        self._loop.call_soon_threadsafe(self._notify)
+
+    def release(self):
+        cleanup, self._cleanup = self._cleanup, None
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"Job {self.job_id} cleanup failed: {e}")
+
+    def _notify(self):
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, version: int, timeout: float) -> int:
+        """Wait until the job changes after `version` (or timeout); returns the current version"""
+        if self.version == version:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.version
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        with self._lock:
+            info = {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+            if include_result and self.status == "done":
+                info["result"] = self.result
+        return info
+
+
+# ---------------- JOB QUEUE ---------------- #
+
+class JobQueue:
+    """
+    Bounded background queue served by JOB_WORKERS asyncio workers. Heavy
+    steps inside a job (parsing, profiling) run in the threadpool, so
+    workers only bound how many jobs make progress at once. Submitting
+    fails fast with JobQueueFull instead of letting the backlog grow.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE, ttl: float = JOB_TTL_SECONDS):
+        self.workers = max(workers, 1)
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_workers(self) -> asyncio.Queue:
+        # The queue and workers belong to the running event loop
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+            self._loop = loop
+        return self._queue
+
+    def _evict_finished(self, now: float):
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and now - job.updated_at > self.ttl]:
+            del self._jobs[job_id]
+
+    def submit(
+        self,
+        kind: str,
+        run: Callable[[Job], Awaitable[object]],
+        cleanup: Optional[Callable[[], None]] = None
+    ) -> Job:
+        """Queue run(job); its return value becomes the job result. cleanup runs once the job ends or is dropped"""
+        queue = self._ensure_workers()
+        job = Job(kind, self._loop, cleanup)
+        try:
+            queue.put_nowait((job, run))
+        except asyncio.QueueFull:
+            job.release()
+            raise JobQueueFull(f"Job queue is full ({self.queue_size} jobs waiting)")
+
+        self._evict_finished(time.time())
+        self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._evict_finished(time.time())
+        return self._jobs.get(job_id)
+
+    async def _work(self):
+        while True:
+            job, run = await self._queue.get()
+            try:
+                job.start()
+                job.finish("done", result=await run(job))
+            except HTTPException as e:
+                job.finish("failed", error=str(e.detail))
+            except asyncio.CancelledError:
+                job.finish("failed", error="Job cancelled")
+                raise
+            except Exception as e:
+                print(f"Job {job.job_id} failed: {e}")
+                job.finish("failed", error=str(e))
+            finally:
+                job.release()
+                self._queue.task_done()
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        # Jobs still waiting will never run; fail them and release what they hold
+        while self._queue is not None and not self._queue.empty():
+            job, _ = self._queue.get_nowait()
+            job.finish("failed", error="Job queue shut down")
+            job.release()
+        self._tasks, self._queue, self._loop = [], None, None
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self._jobs),
+            "waiting": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+        }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# In-memory LRU size and entry lifetime
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("DATANOVA_LLM_CACHE_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("DATANOVA_LLM_CACHE_TTL", "86400"))
+
+# Optional SQLite file that keeps responses across restarts and workers
+LLM_CACHE_PATH = os.getenv("DATANOVA_LLM_CACHE_PATH")
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("DATANOVA_LLM_CACHE_DISK_ENTRIES", "100000"))
+
+
+# ---------------- LLM RESPONSE CACHE ---------------- #
+
+class LLMResponseCache:
+    """
+    Completion cache keyed on model, rendered messages, max_tokens and
+    temperature. Memory is an LRU with TTL; an optional SQLite backend
+    is consulted on memory misses. Async callers use aget()/aset(), which
+    keep SQLite reads, writes and commits off the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: float = LLM_CACHE_TTL_SECONDS,
+        disk_path: Optional[str] = LLM_CACHE_PATH,
+        disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(payload: dict) -> str:
+        key_fields = {
+            "model": payload.get("model"),
+            "messages": payload.get("messages"),
+            "max_tokens": payload.get("max_tokens"),
+            "temperature": payload.get("temperature"),
+        }
+        return hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = self._disk_get(key, now)
+        self._count(value is not None)
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for async callers: memory on the event loop, SQLite in the threadpool"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = await run_in_threadpool(self._disk_get, key, now)
+        self._count(value is not None)
+        return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            self._disk_set(key, now, value)
+
+    async def aset(self, key: str, value: str):
+        """set() for async callers; the SQLite write and commit run in the threadpool"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._db is not None:
+            await run_in_threadpool(self._disk_set, key, now, value)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and now - item[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        # A separate lock, so memory lookups never wait for disk I/O
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT created, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or now - row[0] > self.ttl:
+            return None
+        with self._lock:
+            self._remember(key, row[0], row[1])
+        return row[1]
+
+    def _disk_set(self, key: str, now: float, value: str):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, created, value) VALUES (?, ?, ?)",
+                (key, now, value)
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE created < ? OR key NOT IN "
+                "(SELECT key FROM responses ORDER BY created DESC LIMIT ?)",
+                (now - self.ttl, self.disk_max_entries)
+            )
+            self._db.commit()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _remember(self, key: str, created: float, value: str):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "disk": self._db is not None,
+            }
+
+
+llm_cache = LLMResponseCache()
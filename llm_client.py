@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+
+from llm_cache import llm_cache
+from single_flight import llm_flights
+
+TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
+
+# Connection pool / concurrency limits shared by every router
+LLM_MAX_CONNECTIONS = int(os.getenv("DATANOVA_LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("DATANOVA_LLM_MAX_IN_FLIGHT", "16"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("DATANOVA_LLM_CONNECT_TIMEOUT", "5"))
+
+# Per-call timeouts (seconds)
+SUMMARY_TIMEOUT = float(os.getenv("DATANOVA_SUMMARY_TIMEOUT", "15"))
+CHAT_TIMEOUT = float(os.getenv("DATANOVA_CHAT_TIMEOUT", "12"))
+
+
+class LLMError(Exception):
+    """Raised when the upstream completion API returns an unusable response"""
+
+
+# ---------------- ASYNC LLM CLIENT ---------------- #
+
+class LLMClient:
+    """
+    Shared non-blocking client for the Together chat completions API.
+    Keeps a keep-alive connection pool and caps the number of requests in
+    flight, so slow completions never block the event loop.
+    """
+
+    def __init__(
+        self,
+        url: str = TOGETHER_API_URL,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # The pool and semaphore belong to the running event loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(SUMMARY_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+        return self._client
+
+    async def chat_completion(
+        self,
+        payload: dict,
+        api_key: str,
+        timeout: float,
+        use_cache: bool = True
+    ) -> str:
+        """POST a chat completion payload and return the message content"""
+        cache_key = llm_cache.make_key(payload) if use_cache else None
+        if cache_key:
+            cached = await llm_cache.aget(cache_key)
+            if cached is not None:
+                return cached
+            # Identical completions already in flight share one upstream call
+            return await llm_flights.run(cache_key, lambda: self._complete(payload, api_key, timeout, cache_key))
+
+        return await self._complete(payload, api_key, timeout, None)
+
+    async def _complete(self, payload: dict, api_key: str, timeout: float, cache_key: Optional[str]) -> str:
+        client = self._ensure_client()
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        async with self._semaphore:
+            response = await client.post(
+                self.url,
+                headers=headers,
+                json=payload,
+                timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT)
+            )
+
+        if response.status_code != 200:
+            raise LLMError(f"Status {response.status_code}")
+
+        try:
+            content = response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError(f"Malformed response: {e}")
+
+        if cache_key:
+            await llm_cache.aset(cache_key, content)
+        return content
+
+    async def stream_chat_completion(
+        self,
+        payload: dict,
+        api_key: str,
+        timeout: float,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Yield content deltas as the upstream API produces them. If the same
+        completion is already in flight for another request, its full text
+        is yielded once it is ready instead of calling upstream again.
+        """
+        cache_key = llm_cache.make_key(payload) if use_cache else None
+        if cache_key:
+            cached = await llm_cache.aget(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+            flight = llm_flights.join(cache_key)
+            if flight is not None:
+                content = await asyncio.shield(flight)
+                if content:
+                    yield content
+                return
+
+        # The upstream stream runs in its own task, so a leader that disconnects
+        # does not interrupt it for requests waiting on the same completion
+        deltas: asyncio.Queue = asyncio.Queue()
+        upstream = lambda: self._stream(payload, api_key, timeout, cache_key, deltas.put_nowait)
+        task = llm_flights.start(cache_key, upstream) if cache_key else asyncio.ensure_future(upstream())
+        try:
+            while (delta := await deltas.get()) is not None:
+                yield delta
+            await asyncio.shield(task)   # re-raises an upstream failure
+        finally:
+            if not cache_key and not task.done():
+                # Nobody else can use an uncached stream
+                task.cancel()
+
+    async def _stream(
+        self,
+        payload: dict,
+        api_key: str,
+        timeout: float,
+        cache_key: Optional[str],
+        on_delta: Callable[[Optional[str]], None]
+    ) -> str:
+        """Run one upstream stream to the end, passing each delta (then None) to on_delta"""
+        client = self._ensure_client()
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        parts = []
+        try:
+            async with self._semaphore:
+                async with client.stream(
+                    "POST",
+                    self.url,
+                    headers=headers,
+                    json={**payload, "stream": True},
+                    timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT)
+                ) as response:
+                    if response.status_code != 200:
+                        raise LLMError(f"Status {response.status_code}")
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        except (ValueError, KeyError, IndexError):
+                            continue
+                        if delta:
+                            parts.append(delta)
+                            on_delta(delta)
+        finally:
+            on_delta(None)
+
+        content = "".join(parts)
+        if cache_key and parts:
+            await llm_cache.aset(cache_key, content)
+        return content
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_client = LLMClient()
@@ -4,6 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from summarizer import router as summary_router
 from visualizer import router as visualizer_router
 from qna import router as qna_router
+from datasets import router as datasets_router
+from chart_cache import chart_cache
+from chat_sessions import chat_sessions
+from chart_renderer import chart_engine
+from llm_cache import llm_cache
+from llm_client import llm_client
+from single_flight import coalescing_stats
+from jobs import job_queue
 
 app = FastAPI(
     title="DataNova API", 
@@ -25,6 +33,7 @@ app.add_middleware(
 app.include_router(summary_router, prefix="/api", tags=["Summarizer"])
 app.include_router(visualizer_router, prefix="/api", tags=["Visualizer"])
 app.include_router(qna_router, prefix="/api", tags=["Q&A"])
+app.include_router(datasets_router, prefix="/api", tags=["Datasets"])
 
 
 # ---------------- ROOT & HEALTH ENDPOINTS ---------------- #
@@ -39,7 +48,8 @@ def root():
             "summarizer": "/api/summary",
             "visualizer": "/api/visualize",
             "column_analysis": "/api/analyze-columns",
-            "qna": "/api/qna"
+            "qna": "/api/qna",
+            "datasets": "/api/datasets"
         }
     }
 
@@ -49,7 +59,12 @@ def health():
     return {
         "status": "healthy",
         "version": "3.0",
-        "service": "DataNova API"
+        "service": "DataNova API",
+        "llm_cache": llm_cache.stats(),
+        "chart_cache": chart_cache.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "coalescing": coalescing_stats(),
+        "jobs": job_queue.stats()
     }
 
 
@@ -64,7 +79,17 @@ async def startup_event():
     print("📈 Visualizer: /api/visualize")
     print("📋 Column Analysis: /api/analyze-columns")
     print("❓ Q&A: /api/qna")
+    print("🗂️ Datasets: /api/datasets")
     print("=" * 50)
+    await chart_engine.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled upstream connections, chart workers and job workers"""
+    await llm_client.aclose()
+    chart_engine.shutdown()
+    await job_queue.shutdown()
 
 
 # ---------------- MAIN ---------------- #
@@ -0,0 +1,353 @@
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from sampling import SAMPLE_SEED, ReservoirSample
+from sketches import HyperLogLog, QuantileSketch, TopK
+
+# Rows parsed / profiled per chunk when streaming a CSV
+PROFILE_CHUNK_ROWS = 50_000
+HEAD_ROWS = 10
+TOP_VALUES = 5
+# Columns in the preformatted sample/statistics text; column_stats covers all of them
+PREVIEW_COLUMNS = 20
+
+
+# ---------------- DTYPE HELPERS ---------------- #
+
+def is_numeric_series(series: pd.Series) -> bool:
+    """Same rule as select_dtypes(include=["number"]): booleans are not numeric"""
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def is_categorical_series(series: pd.Series) -> bool:
+    """
+    Text-like columns (object / string / category dtypes), including
+    ISO dates the dtype optimizer parsed from text
+    """
+    return (
+        pd.api.types.is_object_dtype(series)
+        or pd.api.types.is_string_dtype(series)
+        or isinstance(series.dtype, pd.CategoricalDtype)
+        or pd.api.types.is_datetime64_any_dtype(series)
+    )
+
+
+def dtype_label(series: pd.Series) -> str:
+    """The dtype read_csv gives the column, so compacted frames profile like the CSV"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return str(dtype.categories.dtype)
+    if isinstance(dtype, np.dtype) and dtype.kind == "i":
+        return "int64"
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        return "float64"
+    return str(dtype)
+
+
+def display_value(value):
+    """Plain Python value for reports; dates without a time print as dates"""
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat() if value == value.normalize() else value.isoformat(sep=" ")
+    return value.item() if hasattr(value, "item") else value
+
+
+def combine_dtypes(current: Optional[str], current_numeric: bool, new: str, new_numeric: bool) -> str:
+    """Dtype a full-file parse would have given after seeing another chunk"""
+    if current is None or current == new:
+        return new
+    if current_numeric and new_numeric:
+        return str(np.result_type(current, new))
+    return current if not current_numeric else new
+
+
+def head_records(head: pd.DataFrame) -> list[dict]:
+    """Head rows as records, dates formatted as text the way the column prints"""
+    dates = [name for name, dtype in head.dtypes.items() if pd.api.types.is_datetime64_any_dtype(dtype)]
+    if dates:
+        head = head.copy()
+        for name in dates:
+            head[name] = head[name].astype(str).where(head[name].notna(), None)
+    return head.to_dict(orient='records')
+
+
+# ---------------- MERGEABLE ACCUMULATORS ---------------- #
+
+class NumericMoments:
+    """Count / mean / variance / min / max, mergeable across chunks (Chan et al.)"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "NumericMoments":
+        moments = cls()
+        values = values[~np.isnan(values)]
+        if len(values):
+            moments.count = len(values)
+            moments.mean = float(values.mean())
+            moments.m2 = float(((values - moments.mean) ** 2).sum())
+            moments.min = float(values.min())
+            moments.max = float(values.max())
+        return moments
+
+    def merge(self, other: "NumericMoments") -> "NumericMoments":
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def describe(self) -> dict:
+        if self.count == 0:
+            return {"count": 0, "mean": math.nan, "std": math.nan, "min": math.nan, "max": math.nan}
+        return {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+
+
+class ColumnProfile:
+    """
+    Per-column null count, dtype, moments and mergeable sketches: distinct
+    count (HyperLogLog), quantiles (KLL) and top values (Misra-Gries).
+    Memory is bounded per column whatever the number of rows or distinct values.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dtype: Optional[str] = None
+        self.numeric = True
+        self.categorical = False
+        self.nulls = 0
+        self.values = 0
+        self.moments = NumericMoments()
+        self.distinct_sketch = HyperLogLog()
+        self.quantile_sketch = QuantileSketch()
+        self.top_sketch = TopK()
+
+    def update(self, series: pd.Series):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            # Dates are parsed after ingest; profile them as the CSV text they came from,
+            # so a reloaded dataset reports the same dtype, distinct and top values
+            series = series.astype(str).where(series.notna())
+        numeric = is_numeric_series(series)
+        self.dtype = combine_dtypes(self.dtype, self.numeric, dtype_label(series), numeric)
+        self.numeric = self.numeric and numeric
+        self.categorical = self.categorical or is_categorical_series(series)
+        nulls = int(series.isna().sum())
+        self.nulls += nulls
+        self.values += len(series) - nulls
+        self.distinct_sketch.update(series)
+
+        # High-cardinality numeric columns only need the HLL for distinct counts
+        if not self.numeric or self.top_sketch.exact:
+            self.top_sketch.update(series)
+
+        if self.numeric:
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+            self.moments.merge(NumericMoments.from_values(values))
+            self.quantile_sketch.update(values)
+
+    def merge(self, other: "ColumnProfile") -> "ColumnProfile":
+        if other.dtype is not None:
+            self.dtype = combine_dtypes(self.dtype, self.numeric, other.dtype, other.numeric)
+        self.numeric = self.numeric and other.numeric
+        self.categorical = self.categorical or other.categorical
+        self.nulls += other.nulls
+        self.values += other.values
+        self.moments.merge(other.moments)
+        self.distinct_sketch.merge(other.distinct_sketch)
+        self.quantile_sketch.merge(other.quantile_sketch)
+        self.top_sketch.merge(other.top_sketch)
+        return self
+
+    @property
+    def distinct(self) -> int:
+        """Distinct non-null values: exact for low cardinality, HyperLogLog estimate otherwise"""
+        exact = self.top_sketch.distinct
+        return exact if exact is not None else min(self.distinct_sketch.estimate(), self.values)
+
+    @property
+    def discrete(self) -> bool:
+        """Text or low-cardinality column, best charted as categories"""
+        return not self.numeric or self.distinct < 20
+
+    def top_values(self, n: int = TOP_VALUES) -> list[dict]:
+        if self.numeric:
+            return []
+        return [
+            {"value": display_value(value), "count": int(count)}
+            for value, count in self.top_sketch.top(n).items()
+        ]
+
+    def describe(self) -> dict:
+        """describe()-style numbers; percentiles come from the quantile sketch"""
+        stats = self.moments.describe()
+        p25, p50, p75 = self.quantile_sketch.quantiles([0.25, 0.5, 0.75])
+        return {
+            "count": stats["count"], "mean": stats["mean"], "std": stats["std"], "min": stats["min"],
+            "25%": p25, "50%": p50, "75%": p75, "max": stats["max"],
+        }
+
+    def to_dict(self) -> dict:
+        stats = {
+            "dtype": self.dtype,
+            "nulls": self.nulls,
+            "distinct": self.distinct,
+            "distinct_exact": self.top_sketch.exact,
+            "top_values": self.top_values(),
+        }
+        if self.numeric:
+            for key, value in self.describe().items():
+                stats[key] = None if isinstance(value, float) and math.isnan(value) else value
+        return stats
+
+
+class DatasetProfile:
+    """
+    Single-pass dataset profile. Feed it chunks with update(); profiles built
+    on separate chunks or workers combine with merge(). Memory use depends
+    on the number of columns and the sample size, never on the number of rows.
+    """
+
+    def __init__(self, seed: int = SAMPLE_SEED):
+        self.rows = 0
+        self.columns: dict[str, ColumnProfile] = {}
+        self.head: Optional[pd.DataFrame] = None
+        self.reservoir = ReservoirSample(seed=seed)
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        self.reservoir.update(chunk)
+
+        if self.head is None:
+            self.head = chunk.head(HEAD_ROWS).copy()
+        elif len(self.head) < HEAD_ROWS:
+            self.head = pd.concat([self.head, chunk.head(HEAD_ROWS - len(self.head))], ignore_index=True)
+
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnProfile(col)
+            self.columns[col].update(chunk[col])
+
+    def merge(self, other: "DatasetProfile") -> "DatasetProfile":
+        """Combine with a profile of the rows that follow this one"""
+        self.rows += other.rows
+        self.reservoir.merge(other.reservoir)
+
+        if self.head is None:
+            self.head = other.head
+        elif other.head is not None and len(self.head) < HEAD_ROWS:
+            self.head = pd.concat([self.head, other.head.head(HEAD_ROWS - len(self.head))], ignore_index=True)
+
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        return self
+
+    def sample(self, n: Optional[int] = None) -> pd.DataFrame:
+        """Reproducible uniform sample of the dataset, in file order"""
+        return self.reservoir.sample(n)
+
+    @property
+    def numeric_columns(self) -> list[str]:
+        return [name for name, col in self.columns.items() if col.numeric]
+
+    @property
+    def categorical_columns(self) -> list[str]:
+        return [name for name, col in self.columns.items() if not col.numeric and col.categorical]
+
+    @property
+    def missing_values(self) -> dict[str, int]:
+        return {name: col.nulls for name, col in self.columns.items()}
+
+    def column_info(self) -> dict:
+        """Column lists for the frontend dropdowns"""
+        return {
+            "numeric_columns": self.numeric_columns,
+            "categorical_columns": self.categorical_columns,
+            "all_columns": list(self.columns)
+        }
+
+    def column_stats(self) -> dict[str, dict]:
+        return {name: col.to_dict() for name, col in self.columns.items()}
+
+    def statistics_table(self, max_columns: Optional[int] = None) -> str:
+        """describe()-style table of the numeric columns"""
+        numeric = self.numeric_columns[:max_columns]
+        if not numeric:
+            return "No numeric columns"
+
+        stats = pd.DataFrame({name: self.columns[name].describe() for name in numeric})
+        return stats.round(2).to_string()
+
+    def to_df_info(self, filename: str) -> dict:
+        """The df_info dict consumed by prompts, insights and regeneration"""
+        head = self.head if self.head is not None else pd.DataFrame()
+
+        return {
+            'filename': filename,
+            'rows': self.rows,
+            'columns': len(self.columns),
+            'column_names': list(self.columns),
+            'head_data': head_records(head),
+            'dtypes': {name: col.dtype for name, col in self.columns.items()},
+            'missing_values': self.missing_values,
+            'distinct_values': {name: col.distinct for name, col in self.columns.items()},
+            'numeric_columns': self.numeric_columns,
+            'categorical_columns': self.categorical_columns,
+            'sample_data': head.iloc[:, :PREVIEW_COLUMNS].head(5).to_string(index=False),
+            'statistics': self.statistics_table(PREVIEW_COLUMNS),
+            'column_stats': self.column_stats(),
+        }
+
+
+# ---------------- ENTRY POINTS ---------------- #
+
+def frame_column_info(df: pd.DataFrame) -> dict:
+    """DatasetProfile.column_info() from a frame's dtypes alone, e.g. for a parsed prefix of a file"""
+    return {
+        "numeric_columns": [name for name in df.columns if is_numeric_series(df[name])],
+        "categorical_columns": [
+            name for name in df.columns if not is_numeric_series(df[name]) and is_categorical_series(df[name])
+        ],
+        "all_columns": list(df.columns)
+    }
+
+
+def profile_chunks(chunks: Iterable[pd.DataFrame], seed: int = SAMPLE_SEED) -> DatasetProfile:
+    profile = DatasetProfile(seed)
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile
+
+
+def profile_dataset(df: pd.DataFrame, chunksize: int = PROFILE_CHUNK_ROWS, seed: int = SAMPLE_SEED) -> DatasetProfile:
+    """
+    Profile an in-memory frame with the same accumulators used for streamed
+    uploads; pass dataset_seed(dataset_id) for the dataset's own sample
+    """
+    chunks = (df.iloc[start:start + chunksize] for start in range(0, max(len(df), 1), chunksize))
+    return profile_chunks(chunks, seed)
@@ -0,0 +1,119 @@
+import math
+import os
+from typing import Optional
+
+import pandas as pd
+
+# Input-token budget for a summary prompt (~4 chars per token). Wide datasets
+# keep their most informative columns; the rest are listed by name only.
+PROMPT_TOKEN_BUDGET = int(os.getenv("DATANOVA_PROMPT_TOKENS", "2500"))
+# Share of the data budget given to the sample rows, and how many columns they show
+SAMPLE_BUDGET_SHARE = 0.25
+SAMPLE_COLUMNS = 8
+SAMPLE_ROWS = 5
+
+STATS_HEADER = "column|type|missing%|distinct|mean|std|min|median|max|top values"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def fit_lines(lines: list[str], budget: int, keep: int = 0) -> list[str]:
+    """Leading lines that fit in `budget` tokens; the first `keep` lines (headers) are always kept"""
+    kept = lines[:keep]
+    used = sum(estimate_tokens(line) for line in kept)
+    for line in lines[keep:]:
+        used += estimate_tokens(line)
+        if used > budget:
+            break
+        kept.append(line)
+    return kept
+
+
+def fit_text(text: str, budget: int) -> str:
+    """Whole lines that fit in `budget` tokens, or a cut-off prefix if even the first line does not"""
+    lines = fit_lines(text.splitlines(), budget)
+    return "\n".join(lines) if lines else text[:budget * 4] + " ..."
+
+
+def compact_number(value) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+# ---------------- COLUMN RANKING ---------------- #
+
+def column_score(stats: dict, rows: int) -> float:
+    """
+    How much a column is worth telling the model about, in [0, 1.25]:
+    relative spread for numbers, useful cardinality for categories, scaled
+    by completeness, plus a bonus for partly missing columns (data quality).
+    """
+    rows = max(rows, 1)
+    missing = stats.get("nulls", 0) / rows
+    distinct = stats.get("distinct") or 0
+
+    if distinct <= 1:
+        spread = 0.0
+    elif stats.get("mean") is not None:
+        std, mean = stats.get("std") or 0.0, abs(stats.get("mean") or 0.0)
+        spread = std / (mean + std) if std > 0 else 0.0
+    elif distinct >= 0.9 * rows * (1 - missing):
+        spread = 0.1   # identifier-like: every value different
+    else:
+        spread = 1.0 if distinct <= 50 else 0.5
+
+    return spread * (0.5 + 0.5 * (1 - missing)) + (0.25 if 0 < missing < 1 else 0.0)
+
+
+def rank_columns(column_stats: dict[str, dict], rows: int) -> list[str]:
+    """Column names, most informative first (ties keep file order)"""
+    return sorted(column_stats, key=lambda name: -column_score(column_stats[name], rows))
+
+
+def stats_line(name: str, stats: dict, rows: int) -> str:
+    missing = 100 * stats.get("nulls", 0) / max(rows, 1)
+    top = ",".join(f"{item['value']}({item['count']})" for item in stats.get("top_values", [])[:3])
+    return "|".join([
+        str(name), str(stats.get("dtype", "")), f"{missing:.3g}", compact_number(stats.get("distinct")),
+        compact_number(stats.get("mean")), compact_number(stats.get("std")), compact_number(stats.get("min")),
+        compact_number(stats.get("50%")), compact_number(stats.get("max")), top,
+    ])
+
+
+# ---------------- BUDGETED SECTIONS ---------------- #
+
+def budget_data_sections(df_info: dict, budget: int) -> tuple[str, str]:
+    """
+    (sample rows, column statistics) for the prompt, together within
+    `budget` tokens. Columns are ranked by informativeness; the sample shows
+    the top-ranked columns and the stats table as many columns as fit.
+    """
+    column_stats: Optional[dict] = df_info.get("column_stats")
+    if not column_stats:
+        # dataInfo from older clients: trim the preformatted text instead
+        sample = fit_text(str(df_info.get("sample_data", "Not available")), int(budget * SAMPLE_BUDGET_SHARE))
+        statistics = fit_text(str(df_info.get("statistics", "Not available")), budget - estimate_tokens(sample))
+        return sample, statistics
+
+    rows = df_info.get("rows", 0)
+    ranked = rank_columns(column_stats, rows)
+
+    head = pd.DataFrame(df_info.get("head_data", []))
+    shown = [name for name in ranked if name in head.columns][:SAMPLE_COLUMNS]
+    sample_lines = head[shown].head(SAMPLE_ROWS).to_string(index=False).splitlines() if shown else []
+    sample = "\n".join(fit_lines(sample_lines, int(budget * SAMPLE_BUDGET_SHARE), keep=1)) or "Not available"
+
+    lines = [STATS_HEADER] + [stats_line(name, column_stats[name], rows) for name in ranked]
+    kept = fit_lines(lines, budget - estimate_tokens(sample) - 50, keep=1)
+    omitted = ranked[len(kept) - 1:]
+    if omitted:
+        listed = fit_lines([str(name) for name in omitted], 50)
+        more = ", ..." if len(listed) < len(omitted) else ""
+        kept.append(f"({len(omitted)} less informative columns omitted: {', '.join(listed)}{more})")
+
+    return sample, "\n".join(kept)
@@ -1,38 +1,221 @@
-import requests
 import os
 import pandas as pd
-import io
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+from chat_sessions import ChatSession, chat_sessions
+from datasets import DatasetEntry, load_cached, resolve_dataset
+from llm_client import llm_client, CHAT_TIMEOUT
+from profiler import DatasetProfile
+from query_engine import answer_question
+from retrieval import relevant_rows_context
+from sampling import STRATIFY_MAX_GROUPS, dataset_seed, sample_frame
+from streaming import sse_event, sse_response, stream_completion_events
 
 router = APIRouter()
 
-TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
 MODEL_NAME = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+CHAT_SAMPLE_ROWS = 3000
 
 
-# ---------------- CHAT ENDPOINT ---------------- #
+# ---------------- CHAT ENDPOINTS ---------------- #
 
 @router.post("/chat")
 async def ask_dataset_question(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
     question: str = Form(...),
-    mode: str = Form("Normal")
+    mode: str = Form("Normal"),
+    dataset_id: Optional[str] = Form(None),
+    stream: bool = Form(False),
+    stratify: Optional[str] = Form(None)   # categorical column to balance the sample on
 ):
+    """
+    Answer a single question about a dataset (no history is kept; see
+    /chat/sessions for follow-up questions).
+    Aggregate questions (totals, averages, extremes, counts, percentiles,
+    by group, with filters) are answered exactly from the full data without
+    calling the LLM (mode "local"). Otherwise the context is built from a
+    reproducible sample, so the same dataset and question always produce the
+    same prompt (and can hit the LLM cache).
+    stream=true returns server-sent events as the answer is generated.
+    """
     try:
-        df = pd.read_csv(io.BytesIO(await file.read()))
-        df.columns = df.columns.str.strip()
+        entry = await resolve_dataset(file, dataset_id)
+        await check_stratify(entry, stratify)
 
-        # limit rows for speed & token safety
-        if len(df) > 3000:
-            df = df.sample(3000)
+        # A one-off session that is never stored
+        session = ChatSession(entry, mode, stratify)
+        return await answer_in_session(session, entry, question, stream, {"dataset_id": entry.dataset_id})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@router.post("/chat/sessions")
+async def open_chat_session(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Form(None),
+    mode: str = Form("Normal"),
+    stratify: Optional[str] = Form(None)
+):
+    """
+    Open a conversation about a dataset. The file (or dataset_id) is sent
+    once; follow-up questions go to /chat/sessions/{session_id}/messages
+    with only the question, and earlier turns are included as history.
+    Sessions are dropped after DATANOVA_CHAT_SESSION_TTL seconds idle.
+    """
+    entry = await resolve_dataset(file, dataset_id)
+    await check_stratify(entry, stratify)
+
+    session = chat_sessions.add(ChatSession(entry, mode, stratify))
+    return {"success": True, **session.info()}
+
+
+@router.post("/chat/sessions/{session_id}/messages")
+async def ask_in_session(
+    session_id: str,
+    question: str = Form(...),
+    stream: bool = Form(False),
+    mode: Optional[str] = Form(None)   # changes the session's answer mode from this question on
+):
+    session = get_session(session_id)
+    if mode:
+        session.mode = mode
+    entry = await run_in_threadpool(get_session_dataset, session)
+    try:
+        meta = {"dataset_id": session.dataset_id, "session_id": session.session_id}
+        return await answer_in_session(session, entry, question, stream, meta)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@router.get("/chat/sessions/{session_id}")
+def chat_session_info(session_id: str):
+    session = get_session(session_id)
+    return {"success": True, **session.info(), "history": session.history}
+
+
+@router.delete("/chat/sessions/{session_id}")
+def close_chat_session(session_id: str):
+    if not chat_sessions.remove(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown or expired chat session: {session_id}")
+    return {"success": True, "session_id": session_id}
+
+
+def get_session(session_id: str) -> ChatSession:
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown or expired chat session: {session_id}. Open a new one via /api/chat/sessions"
+        )
+    return session
+
+
+def get_session_dataset(session: ChatSession) -> DatasetEntry:
+    """The session's dataset from the registry, or reloaded from the disk cache after eviction"""
+    entry = load_cached(session.dataset_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Dataset of chat session {session.session_id} is no longer cached. "
+                   "Open a new one via /api/chat/sessions"
+        )
+    return entry
+
+
+async def check_stratify(entry: DatasetEntry, stratify: Optional[str]):
+    # Built at ingest; only datasets reloaded from disk compute it here (once)
+    stats = await run_in_threadpool(lambda: entry.stats)
+    if stratify and stratify not in stats.columns:
+        raise HTTPException(status_code=400, detail=f"Invalid stratify column: {stratify}")
+    if stratify and stats.columns[stratify].distinct > STRATIFY_MAX_GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot stratify by {stratify}: more than {STRATIFY_MAX_GROUPS} distinct values"
+        )
 
-        api_key = os.getenv("TOGETHER_API_KEY")
-        if not api_key:
-            return {"answer": create_fallback_answer(df, question), "mode": "fallback"}
 
-        context = prepare_dataset_context(df)
+# ---------------- ANSWERING ---------------- #
 
-        prompt = f"""
+def chat_sample(entry: DatasetEntry, stratify: Optional[str]) -> pd.DataFrame:
+    # limit rows for speed & token safety
+    if stratify:
+        return sample_frame(entry.df, CHAT_SAMPLE_ROWS, stratify, seed=dataset_seed(entry.dataset_id))
+    return entry.stats.sample(CHAT_SAMPLE_ROWS)
+
+
+async def answer_in_session(session: ChatSession, entry: DatasetEntry, question: str, stream: bool, meta: dict):
+    """Answer locally if possible, else via the LLM; the finished turn is recorded in the session"""
+    stats = await run_in_threadpool(lambda: entry.stats)
+
+    local = await run_in_threadpool(answer_question, entry.df, stats, question)
+    if local is not None:
+        answer, query = local
+        session.record(question, answer, "local")
+        if stream:
+            async def local_events():
+                yield sse_event("meta", meta)
+                yield sse_event("token", {"text": answer})
+                yield sse_event("done", {"answer": answer, "mode": "local", "query": query})
+
+            return sse_response(local_events())
+        return {"answer": answer, "mode": "local", "query": query, **meta}
+
+    # Sample and base context are built once per session
+    if session.sample is None:
+        session.sample = await run_in_threadpool(chat_sample, entry, session.stratify)
+        session.context = prepare_dataset_context(session.sample, stats)
+
+    api_key = os.getenv("TOGETHER_API_KEY")
+
+    # Rows that mention the entities in the question (BM25 over the full dataset);
+    # the fallback answer does not use them, so skip building the index there
+    relevant = await run_in_threadpool(
+        lambda: relevant_rows_context(entry.df, entry.retrieval_index, question)
+    ) if api_key else None
+
+    context = prepare_dataset_context(session.sample, stats, relevant) if relevant else session.context
+    history = session.recent_history()
+
+    if stream:
+        payload = build_chat_payload(context, question, session.mode, history) if api_key else None
+
+        async def events():
+            yield sse_event("meta", meta)
+            async for event in stream_completion_events(
+                payload, api_key, CHAT_TIMEOUT, lambda: create_fallback_answer(stats, question), "answer",
+                on_done=lambda answer, answer_mode: session.record(question, answer, answer_mode)
+            ):
+                yield event
+
+        return sse_response(events())
+
+    if not api_key:
+        answer, answer_mode = create_fallback_answer(stats, question), "fallback"
+    else:
+        payload = build_chat_payload(context, question, session.mode, history)
+        try:
+            answer = (await llm_client.chat_completion(payload, api_key, timeout=CHAT_TIMEOUT)).strip()
+            answer_mode = "ai"
+        except Exception as api_error:
+            print(f"AI API Error: {api_error}")
+            answer, answer_mode = create_fallback_answer(stats, question), "fallback"
+
+    session.record(question, answer, answer_mode)
+    return {"answer": answer, "mode": answer_mode, **meta}
+
+
+# ---------------- PROMPT BUILDER ---------------- #
+
+def build_chat_payload(context: str, question: str, mode: str, history: Optional[list[dict]] = None) -> dict:
+    prompt = f"""
 You are DataNova AI. You MUST answer strictly using the dataset below.
 
 Dataset Context:
@@ -47,49 +230,35 @@ Rules:
 - Keep response under 150 words
 """
 
-        max_tokens, temperature = get_mode_parameters(mode)
-
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {"role": "system", "content": "You are a dataset question-answering assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
-
-        response = requests.post(
-            TOGETHER_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=12
-        )
+    max_tokens, temperature = get_mode_parameters(mode)
 
-        if response.status_code == 200:
-            data = response.json()
-            answer = data["choices"][0]["message"]["content"].strip()
-            return {"answer": answer, "mode": "ai"}
-        else:
-            return {"answer": create_fallback_answer(df, question), "mode": "fallback"}
-
-    except Exception as e:
-        return {"error": str(e)}
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": "You are a dataset question-answering assistant."},
+            # Earlier turns of the session, so follow-ups can refer back to them
+            *({"role": turn["role"], "content": turn["content"]} for turn in history or []),
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
 
 
 # ---------------- CONTEXT BUILDER ---------------- #
 
-def prepare_dataset_context(df: pd.DataFrame) -> str:
-    rows = len(df)
-    cols = df.columns.tolist()
+def prepare_dataset_context(df: pd.DataFrame, stats: DatasetProfile, relevant: Optional[str] = None) -> str:
+    rows = stats.rows
+    cols = list(stats.columns)
 
-    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-    cat_cols = df.select_dtypes(include=["object"]).columns.tolist()
+    numeric_cols = stats.numeric_columns
+    cat_cols = stats.categorical_columns
+
+    # Rows matching the question replace the generic sample rows
+    if relevant:
+        data_section = f"RELEVANT ROWS:\n{relevant}"
+    else:
+        data_section = f"SAMPLE DATA:\n{df.head(5).to_string(index=False)}"
 
     context = f"""
 OVERVIEW:
@@ -99,8 +268,7 @@ Columns: {', '.join(cols)}
 NUMERIC COLUMNS: {', '.join(numeric_cols[:5])}
 CATEGORICAL COLUMNS: {', '.join(cat_cols[:5])}
 
-SAMPLE DATA:
-{df.head(5).to_string(index=False)}
+{data_section}
 """
     return context.strip()
 
@@ -118,24 +286,25 @@ def get_mode_parameters(mode: str):
 
 # ---------------- FALLBACK ANSWERS ---------------- #
 
-def create_fallback_answer(df: pd.DataFrame, question: str) -> str:
+def create_fallback_answer(stats: DatasetProfile, question: str) -> str:
     q = question.lower()
 
     if "how many rows" in q or "row count" in q:
-        return f"The dataset contains {len(df)} rows."
+        return f"The dataset contains {stats.rows} rows."
 
     if "columns" in q or "column names" in q:
-        return f"The dataset columns are: {', '.join(df.columns.tolist())}."
+        return f"The dataset columns are: {', '.join(stats.columns)}."
 
     if "missing" in q or "null" in q:
-        return f"There are {df.isnull().sum().sum()} missing values in the dataset."
+        return f"There are {sum(stats.missing_values.values())} missing values in the dataset."
 
     if "average" in q or "mean" in q:
-        num_cols = df.select_dtypes(include=["number"]).columns.tolist()
+        num_cols = stats.numeric_columns
         if num_cols:
-            return f"The average of {num_cols[0]} is {df[num_cols[0]].mean():.2f}"
+            return f"The average of {num_cols[0]} is {stats.columns[num_cols[0]].moments.mean:.2f}"
 
     return (
         "I couldn't find that information in the dataset. "
-        "Try asking about row count, column names, missing values, or averages."
+        "Try asking about row count, column names, missing values, or totals, "
+        "averages and counts by column (e.g. \"total sales by region\")."
     )
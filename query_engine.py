@@ -0,0 +1,366 @@
+import operator
+import re
+from typing import Optional
+
+import pandas as pd
+
+from profiler import DatasetProfile, display_value
+from retrieval import STOPWORDS
+
+# Groups listed for "... by <column>" when the question does not say "top N"
+DEFAULT_GROUPS = 10
+# Longest category value (in words) looked up as a filter
+MAX_VALUE_WORDS = 4
+
+AGGREGATE_WORDS = {
+    "count": ["how many", "number of", "count"],
+    "sum": ["total", "sum"],
+    "mean": ["average", "mean", "avg"],
+}
+# Without a group these are aggregations; with one they set the sort order
+EXTREME_WORDS = {
+    "max": ["maximum", "highest", "largest", "biggest", "most", "max", "top"],
+    "min": ["minimum", "lowest", "smallest", "least", "fewest", "min", "bottom"],
+}
+AGGREGATE_LABELS = {
+    "count": "number of rows", "sum": "total", "mean": "average", "min": "minimum", "max": "maximum",
+}
+
+# Checked in order, so two-word operators win over their prefixes
+COMPARISONS = [
+    (r">=|at least|no less than", operator.ge, ">="),
+    (r"<=|at most|no more than", operator.le, "<="),
+    (r">|greater than|more than|above|over|exceeds?", operator.gt, ">"),
+    (r"<|less than|fewer than|below|under", operator.lt, "<"),
+    (r"==?|equals?|equal to", operator.eq, "="),
+]
+NUMBER_PATTERN = r"(-?\d[\d,]*(?:\.\d+)?)"
+GROUP_PREFIX = re.compile(r"(?:by|per|for each|for every|each|across|in each)\s*$")
+PICK_PREFIX = re.compile(r"(?:which|what)\s*$")
+TOP_N = re.compile(r"\b(top|bottom)\s+(\d+)\b")
+PERCENTILE = re.compile(r"\b(\d{1,2}(?:\.\d+)?)(?:st|nd|rd|th)?\s+percentile\b")
+# Questions about the dataset itself, left to the keyword fallback answers
+META_WORDS = ("column", "missing", "null", "dtype")
+# Words that may be left over once a question is parsed; any other word (or
+# number) is a condition the plan did not capture, so the LLM answers instead
+FILLER_WORDS = {
+    "all", "across", "each", "every", "per", "overall", "rows", "row", "records", "record", "entries",
+    "values", "value", "data", "dataset", "table", "can", "could", "you", "please", "give", "find",
+    "get", "list", "calculate", "compute", "did", "were", "we", "our", "my", "s", "sold", "much",
+}
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"[_\s]+", " ", text.lower()).strip()
+
+
+def word_pattern(phrase: str) -> str:
+    return rf"(?<!\w){re.escape(phrase)}(?!\w)"
+
+
+def column_pattern(name: str) -> str:
+    """A column name as a word, also in the plural ("products" for product)"""
+    return rf"(?<!\w){re.escape(name)}(?:e?s)?(?!\w)"
+
+
+def singular_forms(phrase: str) -> list[str]:
+    """The phrase and, if it looks plural, its singular candidates ("laptops" -> "laptop")"""
+    forms = [phrase]
+    if phrase.endswith("es"):
+        forms.append(phrase[:-2])
+    if phrase.endswith("s"):
+        forms.append(phrase[:-1])
+    return forms
+
+
+def format_number(value) -> str:
+    value = float(value)
+    if value.is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}" if abs(value) >= 1 else f"{value:.4g}"
+
+
+# ---------------- QUERY PLAN ---------------- #
+
+class QueryPlan:
+    """A structured aggregate question: filter, optionally group, aggregate one column"""
+
+    def __init__(self):
+        self.aggregate: Optional[str] = None
+        self.metric: Optional[str] = None
+        self.quantile: Optional[float] = None
+        self.group: Optional[str] = None
+        self.limit = DEFAULT_GROUPS
+        self.ascending = False
+        self.values: dict[str, list] = {}
+        self.comparisons: list[tuple[str, object, str, float]] = []
+
+    def label(self) -> str:
+        if self.quantile == 0.5:
+            return f"median {self.metric}"
+        if self.quantile is not None:
+            return f"{format_number(self.quantile * 100)}th percentile of {self.metric}"
+        if self.aggregate == "count":
+            return AGGREGATE_LABELS["count"]
+        return f"{AGGREGATE_LABELS[self.aggregate]} {self.metric}"
+
+    def conditions(self) -> str:
+        parts = [
+            f"{column} is {' or '.join(str(value) for value in values)}"
+            for column, values in self.values.items()
+        ]
+        parts += [f"{column} {symbol} {format_number(number)}" for column, _, symbol, number in self.comparisons]
+        return f" where {' and '.join(parts)}" if parts else ""
+
+    def to_dict(self) -> dict:
+        return {
+            "aggregate": "quantile" if self.quantile is not None else self.aggregate,
+            "column": self.metric,
+            "quantile": self.quantile,
+            "group_by": self.group,
+            "limit": self.limit if self.group else None,
+            "filters": self.values,
+            "comparisons": [
+                {"column": column, "operator": symbol, "value": number}
+                for column, _, symbol, number in self.comparisons
+            ],
+        }
+
+
+class QuestionParser:
+    """
+    Rule-based parser from a question to a QueryPlan. Column types and the
+    category values to look for come from the dataset profile, so parsing
+    never touches the rows. Matched spans are blanked out as they are used.
+    """
+
+    def __init__(self, stats: DatasetProfile, question: str):
+        self.stats = stats
+        self.text = normalize(question)
+
+    def consume(self, start: int, end: int):
+        self.text = self.text[:start] + " " * (end - start) + self.text[end:]
+
+    def find_first(self, words_by_key: dict[str, list[str]]) -> Optional[str]:
+        found = []
+        for key, words in words_by_key.items():
+            for word in words:
+                match = re.search(word_pattern(word), self.text)
+                if match:
+                    found.append((match.start(), key))
+        return min(found)[1] if found else None
+
+    def parse(self) -> Optional[QueryPlan]:
+        plan = QueryPlan()
+
+        match = PERCENTILE.search(self.text)
+        if match:
+            plan.quantile = float(match.group(1)) / 100
+            self.consume(*match.span())
+        else:
+            match = re.search(word_pattern("median"), self.text)
+            if match:
+                plan.quantile = 0.5
+                self.consume(*match.span())
+
+        top = TOP_N.search(self.text)
+        if top:
+            plan.limit, plan.ascending = int(top.group(2)), top.group(1) == "bottom"
+            self.consume(*top.span())
+
+        mentions = self.find_columns(plan, top.end() if top else None)
+        self.find_values(plan)
+
+        aggregate = self.find_first(AGGREGATE_WORDS)
+        extreme = self.find_first(EXTREME_WORDS)
+        if plan.group and extreme and not top:
+            plan.ascending = extreme == "min"
+
+        # The aggregated column: a numeric column that is not the group or a filter.
+        # If none is recognized the question goes to the LLM rather than guessing.
+        used = {plan.group} | set(plan.values) | {column for column, *_ in plan.comparisons}
+        unused = [column for column in mentions if column not in used]
+        plan.metric = next((column for column in unused if self.stats.columns[column].numeric), None)
+
+        if plan.quantile is not None:
+            plan.aggregate = "quantile"
+        elif aggregate:
+            plan.aggregate = aggregate
+        elif plan.group:
+            plan.aggregate = "sum" if plan.metric else "count"
+        elif extreme:
+            plan.aggregate = extreme
+        else:
+            return None
+
+        if plan.aggregate == "count":
+            # "how many products ..." counts distinct values of a text column
+            text_columns = [column for column in unused if not self.stats.columns[column].numeric]
+            if text_columns and not plan.group:
+                plan.aggregate, plan.metric = "distinct", text_columns[0]
+            elif not plan.group and not plan.values and not plan.comparisons and any(
+                word in self.text for word in META_WORDS
+            ):
+                return None
+            else:
+                plan.metric = None
+        elif plan.metric is None:
+            return None
+
+        return None if self.leftover_words() else plan
+
+    def leftover_words(self) -> list[str]:
+        """Words and numbers the plan does not account for"""
+        text = self.text
+        for words in [*AGGREGATE_WORDS.values(), *EXTREME_WORDS.values()]:
+            for word in words:
+                text = re.sub(word_pattern(word), " ", text)
+        return [word for word in re.findall(r"\w+", text) if word not in STOPWORDS and word not in FILLER_WORDS]
+
+    def find_columns(self, plan: QueryPlan, top_end: Optional[int]) -> list[str]:
+        """Mentioned columns in question order; also picks up the group and comparisons"""
+        mentions = []
+        for column in sorted(self.stats.columns, key=lambda name: -len(str(name))):
+            name = normalize(str(column))
+            match = re.search(column_pattern(name), self.text) if name and name not in STOPWORDS else None
+            if match is None:
+                continue
+
+            start, end = match.span()
+            if self.stats.columns[column].numeric:
+                end = self.find_comparison(plan, column, end)
+            mentions.append((start, column))
+            self.consume(start, end)
+
+        mentions.sort(key=lambda item: item[0])
+        self.find_group(plan, mentions, top_end)
+        return [column for _, column in mentions]
+
+    def find_group(self, plan: QueryPlan, mentions: list[tuple[int, str]], top_end: Optional[int]):
+        """"top N <col>" wins over "which <col>", which wins over "by <col>" """
+        candidates = []
+        for start, column in mentions:
+            before = self.text[:start]
+            if top_end is not None and top_end <= start and not before[top_end:].strip():
+                candidates.append((0, column))
+            elif PICK_PREFIX.search(before):
+                candidates.append((1, column))
+            elif GROUP_PREFIX.search(before):
+                candidates.append((2, column))
+
+        if candidates:
+            rank, plan.group = min(candidates, key=lambda item: item[0])
+            if rank == 1 and top_end is None:
+                plan.limit = 1
+
+    def find_comparison(self, plan: QueryPlan, column: str, end: int) -> int:
+        rest = self.text[end:]
+        for words, compare, symbol in COMPARISONS:
+            match = re.match(rf"\s*(?:is |was |are |of )?(?:{words})\s*{NUMBER_PATTERN}(?!\w)", rest)
+            if match:
+                plan.comparisons.append((column, compare, symbol, float(match.group(1).replace(",", ""))))
+                return end + match.end()
+        return end
+
+    def find_values(self, plan: QueryPlan):
+        """Category values (singular or plural) and numbers of low-cardinality columns become equality filters"""
+        lookup = {}
+        for column, profile in self.stats.columns.items():
+            if profile.numeric or column == plan.group:
+                continue
+            for value in profile.top_sketch.counts.index:
+                key = normalize(str(display_value(value)))
+                if key and key not in STOPWORDS and len(key) > 1:
+                    lookup.setdefault(key, (column, value))
+
+        if lookup:
+            words = [match.span() for match in re.finditer(r"\w+", self.text)]
+            for size in range(MAX_VALUE_WORDS, 0, -1):
+                for i in range(len(words) - size + 1):
+                    start, end = words[i][0], words[i + size - 1][1]
+                    found = next(filter(None, map(lookup.get, singular_forms(self.text[start:end]))), None)
+                    if found:
+                        column, value = found
+                        plan.values.setdefault(column, []).append(value)
+                        self.consume(start, end)
+
+        self.find_numbers(plan)
+
+    def find_numbers(self, plan: QueryPlan):
+        """
+        "in 2022": a number left over is a filter on the one numeric column
+        whose (exactly known) values include it; comparisons were taken already
+        """
+        compared = {column for column, *_ in plan.comparisons}
+        columns = [
+            (column, profile.top_sketch.counts.index) for column, profile in self.stats.columns.items()
+            if profile.numeric and profile.top_sketch.exact and column != plan.group and column not in compared
+        ]
+        for match in re.finditer(rf"(?<![\w.]){NUMBER_PATTERN}(?![\w.])", self.text):
+            number = float(match.group(1).replace(",", ""))
+            found = [(column, display_value(values[values == number][0])) for column, values in columns if (values == number).any()]
+            if len(found) == 1:
+                column, value = found[0]
+                plan.values.setdefault(column, []).append(value)
+                self.consume(*match.span())
+
+
+# ---------------- EXECUTION ---------------- #
+
+def execute_plan(df: pd.DataFrame, plan: QueryPlan) -> str:
+    """Run a plan over the full frame and phrase the exact result"""
+    mask = pd.Series(True, index=df.index)
+    for column, values in plan.values.items():
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            # Profiles built at ingest saw these dates as text
+            values = pd.to_datetime(pd.Series(values), errors="coerce")
+        mask &= df[column].isin(values)
+    for column, compare, _, number in plan.comparisons:
+        mask &= compare(df[column], number)
+    frame = df[mask] if len(plan.values) or plan.comparisons else df
+
+    if frame.empty:
+        return f"No rows match{plan.conditions()}."
+
+    if plan.group is None:
+        if plan.aggregate == "count":
+            return f"There are {len(frame):,} rows{plan.conditions()}."
+        series = frame[plan.metric]
+        if plan.aggregate == "distinct":
+            return f"There are {series.nunique():,} distinct {plan.metric} values{plan.conditions()}."
+        value = series.quantile(plan.quantile) if plan.aggregate == "quantile" else series.agg(plan.aggregate)
+        return f"The {plan.label()}{plan.conditions()} is {format_number(value)} ({series.notna().sum():,} rows)."
+
+    grouped = frame.groupby(plan.group, observed=True, sort=False)
+    if plan.aggregate == "count":
+        result = grouped.size()
+    elif plan.aggregate == "distinct":
+        result = grouped[plan.metric].nunique()
+    elif plan.aggregate == "quantile":
+        result = grouped[plan.metric].quantile(plan.quantile)
+    else:
+        result = grouped[plan.metric].agg(plan.aggregate)
+
+    result = result.dropna()
+    result = result.nsmallest(plan.limit) if plan.ascending else result.nlargest(plan.limit)
+    direction = "lowest" if plan.ascending else "highest"
+
+    if plan.limit == 1 and len(result):
+        return (f"{plan.group} {result.index[0]} has the {direction} {plan.label()}{plan.conditions()}: "
+                f"{format_number(result.iloc[0])}.")
+
+    lines = [f"- {key}: {format_number(value)}" for key, value in result.items()]
+    heading = "Bottom" if plan.ascending else "Top"
+    return f"{heading} {len(result)} {plan.group} by {plan.label()}{plan.conditions()}:\n" + "\n".join(lines)
+
+
+def answer_question(df: pd.DataFrame, stats: DatasetProfile, question: str) -> Optional[tuple[str, dict]]:
+    """
+    Exact answer and plan for aggregate questions (sums, averages, extremes,
+    counts, percentiles, by group, with value filters), or None when the
+    question needs the LLM.
+    """
+    plan = QuestionParser(stats, question).parse()
+    if plan is None:
+        return None
+    return execute_plan(df, plan), plan.to_dict()
@@ -0,0 +1,190 @@
+import math
+import os
+import re
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from prompt_budget import fit_lines
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - falls back to tokenizing value by value
+    pa = None
+    pc = None
+
+# Rows returned per question and the prompt budget they must fit in (~4 chars per token)
+RETRIEVAL_TOP_K = int(os.getenv("DATANOVA_RETRIEVAL_TOP_K", "20"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("DATANOVA_RETRIEVAL_TOKENS", "400"))
+# Only the first rows of very large datasets are indexed
+RETRIEVAL_MAX_ROWS = int(os.getenv("DATANOVA_RETRIEVAL_MAX_ROWS", "2000000"))
+
+TOKEN_PATTERN = r"\w+"
+# Same token boundaries for Arrow's RE2 engine (\W is ASCII-only there)
+SEPARATOR_PATTERN = r"[^\p{L}\p{N}_]+"
+BM25_K1 = 1.2
+BM25_B = 0.75
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "does", "do", "for", "from", "has", "have",
+    "how", "i", "in", "is", "it", "me", "of", "on", "or", "show", "tell", "that", "the", "there",
+    "this", "to", "was", "what", "when", "where", "which", "who", "why", "with", "about", "any",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens (minus stopwords) plus adjacent-word bigrams for phrase matches"""
+    words = re.findall(TOKEN_PATTERN, text.lower())
+    bigrams = [f"{first} {second}" for first, second in zip(words, words[1:])
+               if first not in STOPWORDS and second not in STOPWORDS]
+    return [word for word in words if word not in STOPWORDS] + bigrams
+
+
+def tokenize_values(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    tokenize() over many values at once: (value index, token) per token,
+    grouped by value. Vectorized through Arrow compute when available.
+    """
+    if pc is None:
+        value_tokens = [tokenize(str(value)) for value in values]
+        parents = np.repeat(np.arange(len(value_tokens)), [len(tokens) for tokens in value_tokens])
+        tokens = np.empty(len(parents), dtype=object)
+        tokens[:] = [token for value in value_tokens for token in value]
+        return parents, tokens
+
+    words = pc.split_pattern_regex(pc.utf8_lower(pa.array(values, type=pa.string())), SEPARATOR_PATTERN)
+    parents = pc.list_parent_indices(words).to_numpy()
+    words = pc.list_flatten(words)
+    nonempty = pc.not_equal(words, "").to_numpy(zero_copy_only=False)
+    parents, words = parents[nonempty], words.filter(pa.array(nonempty))
+
+    content = ~pc.is_in(words, value_set=pa.array(sorted(STOPWORDS))).to_numpy(zero_copy_only=False)
+    adjacent = (parents[1:] == parents[:-1]) & content[1:] & content[:-1]
+    bigrams = pc.binary_join_element_wise(words[:-1], words[1:], " ").filter(pa.array(adjacent))
+
+    parents = np.concatenate([parents[content], parents[:-1][adjacent]])
+    tokens = np.concatenate([
+        words.filter(pa.array(content)).to_numpy(zero_copy_only=False),
+        bigrams.to_numpy(zero_copy_only=False)
+    ])
+    order = np.argsort(parents, kind="stable")
+    return parents[order], tokens[order]
+
+
+# ---------------- BM25 INDEX ---------------- #
+
+class RetrievalIndex:
+    """
+    BM25 inverted index over the text, categorical and integer values of
+    each row. Postings are stored as flat numpy arrays (CSR layout), so a
+    lookup only touches the rows that contain a query term.
+    """
+
+    def __init__(
+        self,
+        vocab: dict[str, int],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        term_counts: np.ndarray,
+        row_lengths: np.ndarray
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.rows = rows
+        self.term_counts = term_counts
+        self.row_lengths = row_lengths
+        self.avg_length = float(row_lengths.mean()) if len(row_lengths) else 0.0
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, max_rows: int = RETRIEVAL_MAX_ROWS) -> "RetrievalIndex":
+        df = df.head(max_rows)
+        row_ids, tokens = [], []
+
+        for col in df.columns:
+            series = df[col]
+            # Measurements are not entities; only index text and whole numbers
+            if pd.api.types.is_float_dtype(series) or pd.api.types.is_bool_dtype(series):
+                continue
+
+            if pd.api.types.is_integer_dtype(series):
+                # A whole number is a single token; no need to run the tokenizer
+                valid = series.notna().to_numpy()
+                row_ids.append(np.flatnonzero(valid))
+                tokens.append(np.abs(series[valid].to_numpy(dtype=np.int64)).astype(str).astype(object))
+                continue
+
+            # Tokenize each distinct value once, then gather tokens per row
+            codes, uniques = pd.factorize(series)
+            parents, flat_tokens = tokenize_values(np.asarray(uniques, dtype=object).astype(str))
+            lengths = np.bincount(parents, minlength=len(uniques))
+            starts = np.cumsum(lengths) - lengths
+
+            rows = np.flatnonzero(codes >= 0)
+            counts = lengths[codes[rows]]
+            within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            row_ids.append(np.repeat(rows, counts))
+            tokens.append(flat_tokens[np.repeat(starts[codes[rows]], counts) + within])
+
+        row_ids = np.concatenate(row_ids) if row_ids else np.empty(0, dtype=np.int64)
+        tokens = np.concatenate(tokens) if tokens else np.empty(0, dtype=object)
+        term_ids, terms = pd.factorize(tokens)
+        vocab = dict(zip(terms, range(len(terms))))
+
+        # (term, row) -> count, sorted by term then row
+        pairs, term_counts = np.unique(term_ids * max(len(df), 1) + row_ids, return_counts=True)
+        terms, rows = np.divmod(pairs, max(len(df), 1))
+
+        return cls(
+            vocab,
+            np.searchsorted(terms, np.arange(len(vocab) + 1)),
+            rows,
+            term_counts,
+            np.bincount(row_ids, minlength=len(df)).astype(np.float64)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index: posting arrays plus an estimate for the vocab dict"""
+        arrays = self.offsets.nbytes + self.rows.nbytes + self.term_counts.nbytes + self.row_lengths.nbytes
+        # Each vocab entry is a str key and an int value besides the dict's own table
+        vocab = sys.getsizeof(self.vocab) + sum(sys.getsizeof(term) for term in self.vocab) + 28 * len(self.vocab)
+        return arrays + vocab
+
+    def search(self, question: str, k: int = RETRIEVAL_TOP_K) -> list[int]:
+        """Row positions of the best-matching rows, best first"""
+        terms = {self.vocab[token] for token in tokenize(question) if token in self.vocab}
+        if not terms:
+            return []
+
+        total_rows = len(self.row_lengths)
+        matched_rows, scores = [], []
+        for term in terms:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            rows, counts = self.rows[start:end], self.term_counts[start:end]
+
+            idf = math.log(1 + (total_rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.row_lengths[rows] / self.avg_length)
+            matched_rows.append(rows)
+            scores.append(idf * counts * (BM25_K1 + 1) / (counts + norm))
+
+        totals = pd.Series(np.concatenate(scores)).groupby(np.concatenate(matched_rows)).sum()
+        return totals.nlargest(k).index.tolist()
+
+
+# ---------------- PROMPT CONTEXT ---------------- #
+
+def relevant_rows_context(
+    df: pd.DataFrame,
+    index: RetrievalIndex,
+    question: str,
+    budget: int = RETRIEVAL_TOKEN_BUDGET
+) -> Optional[str]:
+    """Best-matching rows as a table, trimmed to fit the token budget (None if nothing matches)"""
+    positions = index.search(question)
+    if not positions:
+        return None
+
+    kept = fit_lines(df.iloc[positions].to_string(index=False).splitlines(), budget, keep=1)
+    return "\n".join(kept) if len(kept) > 1 else None
@@ -0,0 +1,161 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Rows kept in every dataset's reservoir (chat context, chart previews)
+SAMPLE_ROWS = int(os.getenv("DATANOVA_SAMPLE_ROWS", "5000"))
+SAMPLE_SEED = int(os.getenv("DATANOVA_SAMPLE_SEED", "0"))
+# Stratified reservoirs keep up to `size` rows per stratum, so their strata are capped
+STRATIFY_MAX_GROUPS = int(os.getenv("DATANOVA_STRATIFY_MAX_GROUPS", "20"))
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def dataset_seed(dataset_id: Optional[str], seed: int = SAMPLE_SEED) -> int:
+    """
+    Sampling seed for one dataset: SAMPLE_SEED mixed with its content hash,
+    so datasets with the same row count do not sample the same positions
+    """
+    return seed ^ int(dataset_id[:16], 16) if dataset_id else seed
+
+
+def row_keys(start: int, count: int, seed: int = SAMPLE_SEED) -> np.ndarray:
+    """
+    Pseudo-random sort key per row, a seeded hash of the row position.
+    The same file always yields the same keys, however it is chunked, so
+    samples are reproducible for a given dataset hash without RNG state.
+    """
+    positions = np.arange(start, start + count, dtype=np.uint64)
+    return pd.util.hash_array(positions ^ np.uint64(seed * int(_GOLDEN) % 2 ** 64))
+
+
+# ---------------- RESERVOIR ---------------- #
+
+class ReservoirSample:
+    """
+    Bottom-k reservoir: keeps the rows with the smallest keys, which is a
+    uniform sample of everything seen so far and can be filled chunk by
+    chunk while a file streams in. With `stratify`, the bottom-k is kept
+    per value of that column and sample() allocates rows proportionally,
+    so rare groups are still represented. A stratified reservoir holds at
+    most STRATIFY_MAX_GROUPS * size rows; more strata raise ValueError.
+    """
+
+    def __init__(self, size: int = SAMPLE_ROWS, stratify: Optional[str] = None, seed: int = SAMPLE_SEED):
+        self.size = size
+        self.stratify = stratify
+        self.seed = seed
+        self.rows = 0
+        self.frame: Optional[pd.DataFrame] = None
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.positions = np.empty(0, dtype=np.int64)
+        self.strata_counts: dict = {}
+
+    def _keep(self, keys: np.ndarray, strata: Optional[pd.Series]) -> np.ndarray:
+        """Indices of the rows that stay in the reservoir"""
+        if strata is None:
+            if len(keys) <= self.size:
+                return np.arange(len(keys))
+            return np.argpartition(keys, self.size)[:self.size]
+
+        ranks = pd.Series(keys).groupby(strata.to_numpy(), dropna=False).rank(method="first")
+        return np.flatnonzero(ranks.to_numpy() <= self.size)
+
+    def update(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+
+        keys = row_keys(self.rows, len(chunk), self.seed)
+        positions = np.arange(self.rows, self.rows + len(chunk), dtype=np.int64)
+        self.rows += len(chunk)
+
+        strata = chunk[self.stratify] if self.stratify else None
+        if strata is not None:
+            for value, count in strata.value_counts(dropna=False).items():
+                if count:   # category columns also list their unused categories
+                    self.strata_counts[value] = self.strata_counts.get(value, 0) + int(count)
+            self._check_strata()
+
+        # Shrink the chunk to its own candidates before concatenating
+        keep = self._keep(keys, strata)
+        chunk = chunk.iloc[keep].reset_index(drop=True)
+        self._absorb(chunk, keys[keep], positions[keep])
+
+    def _check_strata(self):
+        if len(self.strata_counts) > STRATIFY_MAX_GROUPS:
+            raise ValueError(
+                f"Column '{self.stratify}' has more than {STRATIFY_MAX_GROUPS} distinct values to stratify by"
+            )
+
+    def _absorb(self, frame: pd.DataFrame, keys: np.ndarray, positions: np.ndarray):
+        if self.frame is not None:
+            frame = pd.concat([self.frame, frame], ignore_index=True)
+            keys = np.concatenate([self.keys, keys])
+            positions = np.concatenate([self.positions, positions])
+
+        keep = self._keep(keys, frame[self.stratify] if self.stratify else None)
+        self.frame = frame.iloc[keep].reset_index(drop=True)
+        self.keys, self.positions = keys[keep], positions[keep]
+
+    def merge(self, other: "ReservoirSample") -> "ReservoirSample":
+        """Combine with a reservoir over the rows that follow this one"""
+        for value, count in other.strata_counts.items():
+            self.strata_counts[value] = self.strata_counts.get(value, 0) + count
+        self._check_strata()
+        if other.frame is not None:
+            self._absorb(other.frame, other.keys, other.positions + self.rows)
+        self.rows += other.rows
+        return self
+
+    def sample(self, n: Optional[int] = None) -> pd.DataFrame:
+        """Up to n sampled rows (default: the whole reservoir) in file order"""
+        if self.frame is None:
+            return pd.DataFrame()
+        n = len(self.frame) if n is None else min(n, len(self.frame))
+
+        if self.stratify:
+            chosen = self._allocate(n)
+        else:
+            chosen = np.argsort(self.keys, kind="stable")[:n]
+
+        chosen = chosen[np.argsort(self.positions[chosen], kind="stable")]
+        return self.frame.iloc[chosen].reset_index(drop=True)
+
+    def _allocate(self, n: int) -> np.ndarray:
+        """Proportional allocation across strata, at least one row per stratum"""
+        total = sum(self.strata_counts.values()) or 1
+        quotas = pd.Series({value: max(1, int(round(n * count / total))) for value, count in self.strata_counts.items()})
+
+        # One pass: each row's rank within its stratum against that stratum's quota
+        strata = self.frame[self.stratify].to_numpy()
+        ranks = pd.Series(self.keys).groupby(strata, dropna=False).rank(method="first")
+        return np.flatnonzero(ranks.to_numpy() <= quotas.reindex(strata).to_numpy())
+
+
+# ---------------- ENTRY POINTS ---------------- #
+
+def frame_reservoir(
+    df: pd.DataFrame,
+    size: int = SAMPLE_ROWS,
+    stratify: Optional[str] = None,
+    seed: int = SAMPLE_SEED,
+    chunksize: int = 50_000
+) -> ReservoirSample:
+    """The reservoir a streamed upload of this frame would have built"""
+    reservoir = ReservoirSample(size, stratify, seed)
+    for start in range(0, len(df), chunksize):
+        reservoir.update(df.iloc[start:start + chunksize])
+    return reservoir
+
+
+def sample_frame(
+    df: pd.DataFrame,
+    n: int = SAMPLE_ROWS,
+    stratify: Optional[str] = None,
+    chunksize: int = 50_000,
+    seed: int = SAMPLE_SEED
+) -> pd.DataFrame:
+    """Reproducible sample of an in-memory frame; same rows as the streamed reservoir"""
+    return frame_reservoir(df, n, stratify, seed, chunksize).sample(n)
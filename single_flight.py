@@ -0,0 +1,68 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# ---------------- REQUEST COALESCING ---------------- #
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work: concurrent run() calls with the same
+    key await one shared task and all get its result (or its exception).
+    The key is forgotten as soon as the task finishes, so this never serves
+    stale results; the caches keep finished results.
+    A caller that disconnects does not cancel the work for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = 0
+        self.coalesced = 0
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    def _track(self, key: Hashable, flight: asyncio.Future):
+        self.started += 1
+        self._flights[key] = flight
+
+        def finished(done: asyncio.Future):
+            if self._flights.get(key) is done:
+                del self._flights[key]
+            if not done.cancelled():
+                done.exception()   # retrieved here, so unawaited failures are not logged
+
+        flight.add_done_callback(finished)
+
+    def join(self, key: Hashable) -> Optional[asyncio.Future]:
+        """The in-flight computation for key, if any"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        return flight
+
+    def start(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> asyncio.Future:
+        """
+        Start func() as the flight for key without awaiting it; for callers
+        that consume the work as it runs (streams) while others join it.
+        """
+        flight = asyncio.ensure_future(func())
+        self._track(key, flight)
+        return flight
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        flight = self.join(key)
+        if flight is None:
+            flight = self.start(key, func)
+        return await asyncio.shield(flight)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
+
+
+llm_flights = SingleFlight("llm")
+chart_flights = SingleFlight("chart")
+summary_flights = SingleFlight("summary")
+
+
+def coalescing_stats() -> dict:
+    return {flight.name: flight.stats() for flight in (llm_flights, chart_flights, summary_flights)}
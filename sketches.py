@@ -0,0 +1,167 @@
+import math
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Accuracy knobs. HLL relative error ~ 1.04 / sqrt(2 ** precision); KLL rank
+# error ~ 1.7 / k; top-k counts are exact until a column has more than
+# TOPK_CAPACITY distinct values, then off by at most rows / (capacity + 1).
+HLL_PRECISION = int(os.getenv("DATANOVA_HLL_PRECISION", "12"))
+QUANTILE_K = int(os.getenv("DATANOVA_QUANTILE_K", "200"))
+TOPK_CAPACITY = int(os.getenv("DATANOVA_TOPK_CAPACITY", "1024"))
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-null values, stable across processes"""
+    return pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy(dtype=np.uint64)
+
+
+# ---------------- DISTINCT COUNT ---------------- #
+
+class HyperLogLog:
+    """HyperLogLog distinct counter; merging takes the register-wise max"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, series: pd.Series):
+        hashes = hash_values(series)
+        if not len(hashes):
+            return
+
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest_bits = 64 - self.precision
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+
+        # Position of the leftmost 1-bit in the remaining bits (1-based)
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, rest_bits + 1, rest_bits - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+# ---------------- QUANTILES ---------------- #
+
+class QuantileSketch:
+    """
+    KLL quantile sketch. Level h holds items of weight 2 ** h; full levels
+    are sorted and every other item is promoted, so memory stays O(k).
+    """
+
+    def __init__(self, k: int = QUANTILE_K, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[int(self._rng.integers(2))::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantiles(self, qs: list[float]) -> list[float]:
+        if self.count == 0:
+            return [math.nan] * len(qs)
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+
+        ranks = np.asarray(qs) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, ranks, side="left"), len(values) - 1)
+        return [float(value) for value in values[positions]]
+
+
+# ---------------- HEAVY HITTERS ---------------- #
+
+class TopK:
+    """
+    Misra-Gries heavy hitters over at most `capacity` counters. Counts are
+    exact until the column exceeds capacity distinct values; after that they
+    are lower bounds that undercount by at most rows / (capacity + 1).
+    """
+
+    def __init__(self, capacity: int = TOPK_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64")
+        self.exact = True
+
+    def _add(self, counts: pd.Series):
+        merged = self.counts.add(counts, fill_value=0) if len(self.counts) else counts
+        if len(merged) > self.capacity:
+            # Mergeable summaries: subtract the (capacity + 1)-th largest count
+            threshold = merged.nlargest(self.capacity + 1).iloc[-1]
+            merged = merged[merged > threshold] - threshold
+            self.exact = False
+        self.counts = merged.astype("int64")
+
+    def update(self, series: pd.Series):
+        counts = series.value_counts()
+        if isinstance(counts.index, pd.CategoricalIndex):
+            # Categories absent from this chunk are listed with a zero count
+            counts = counts[counts > 0]
+            counts.index = counts.index.astype(counts.index.categories.dtype)
+        self._add(counts)
+
+    def merge(self, other: "TopK") -> "TopK":
+        self.exact = self.exact and other.exact
+        self._add(other.counts)
+        return self
+
+    @property
+    def distinct(self) -> Optional[int]:
+        """Exact distinct count while every value still has a counter"""
+        return len(self.counts) if self.exact else None
+
+    def top(self, n: int) -> pd.Series:
+        return self.counts.nlargest(n)
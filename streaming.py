@@ -0,0 +1,68 @@
+import json
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from llm_client import llm_client
+
+
+# ---------------- REQUEST FLAGS ---------------- #
+
+def is_truthy(value) -> bool:
+    """Boolean from a form/JSON flag; the strings "false", "0", "no" and "off" are False"""
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+# ---------------- SERVER-SENT EVENTS ---------------- #
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def stream_completion_events(
+    payload: Optional[dict],
+    api_key: Optional[str],
+    timeout: float,
+    fallback: Callable[[], str],
+    result_key: str,
+    on_done: Optional[Callable[[str, str], None]] = None
+) -> AsyncIterator[str]:
+    """
+    Forward upstream tokens as `token` events, then finish with a `done`
+    event carrying the full text and mode. Without an API key, or if the
+    upstream call fails before the first token, the fallback text is sent.
+    on_done(text, mode) is called with the final text before `done` is sent.
+    """
+    parts = []
+
+    if api_key and payload:
+        try:
+            async for delta in llm_client.stream_chat_completion(payload, api_key, timeout):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except Exception as api_error:
+            print(f"AI API Error: {api_error}")
+            if parts:
+                yield sse_event("error", {"detail": str(api_error)})
+
+        if parts:
+            text = "".join(parts)
+            if on_done is not None:
+                on_done(text, "ai")
+            yield sse_event("done", {result_key: text, "mode": "ai"})
+            return
+
+    text = fallback()
+    yield sse_event("token", {"text": text})
+    if on_done is not None:
+        on_done(text, "fallback")
+    yield sse_event("done", {result_key: text, "mode": "fallback"})
@@ -1,15 +1,23 @@
-import requests
-import pandas as pd
 import os
 import io
 import json
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
+from datasets import DatasetEntry, get_dataset, hash_stream, ingest_stream, load_cached
+from jobs import Job, JobQueueFull, job_queue
+from llm_client import llm_client, SUMMARY_TIMEOUT
+from prompt_budget import PROMPT_TOKEN_BUDGET, budget_data_sections, estimate_tokens
+from single_flight import summary_flights
+from streaming import is_truthy, sse_event, sse_response, stream_completion_events
+
 router = APIRouter()
 
-TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
 MODEL_NAME = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+# Seconds between progress events on a job stream while nothing changes
+JOB_EVENT_HEARTBEAT = 15
 
 
 # ---------------- ENHANCED SUMMARY ENDPOINT ---------------- #
@@ -21,6 +29,7 @@ async def summarize_dataset(request: Request):
     1. New CSV file uploads (multipart/form-data)
     2. Regeneration with existing data (application/json)
     3. Customizable length, tone, and audience
+    4. stream=true for server-sent events as the summary is generated
     """
     content_type = request.headers.get("content-type", "")
     
@@ -33,13 +42,24 @@ async def summarize_dataset(request: Request):
             tone = data.get('tone', 'professional')
             audience = data.get('audience', 'general')
             style = data.get('style', 'Executive Summary')
+            stream = is_truthy(data.get('stream', False))
             
+            # A registered dataset can be summarized without re-uploading it
+            if not existing_data and data.get('dataset_id'):
+                entry = get_dataset(data['dataset_id'])
+                return await summarize_entry(entry, length, tone, audience, style, stream)
+
             if not existing_data:
-                raise HTTPException(status_code=400, detail="No existingData provided")
+                raise HTTPException(status_code=400, detail="No existingData or dataset_id provided")
             
             df_info = existing_data.get('dataInfo')
             if not df_info:
                 raise HTTPException(status_code=400, detail="No dataInfo found in existingData")
+
+            if stream:
+                return stream_summary_response(
+                    df_info, existing_data.get('dataset_id'), length, tone, audience, style
+                )
             
             # Regenerate summary with new preferences
             summary_text, mode = await generate_summary_from_info(
@@ -65,122 +85,310 @@ async def summarize_dataset(request: Request):
                 }
             }
         
-        # Handle multipart/form-data request (new file upload)
+        # Handle multipart/form-data request (new file upload or registered dataset)
         else:
             form = await request.form()
             file = form.get('file')
+            dataset_id = form.get('dataset_id')
             length = form.get('length', 'medium')
             tone = form.get('tone', 'professional')
             audience = form.get('audience', 'general')
             style = form.get('style', 'Executive Summary')
+            stream = is_truthy(form.get('stream', False))
             
-            if not file:
-                raise HTTPException(status_code=400, detail="No file provided")
+            if not file and not dataset_id:
+                raise HTTPException(status_code=400, detail="No file or dataset_id provided")
             
             # Verify it's a CSV file
-            if not file.filename.endswith('.csv'):
+            if not dataset_id and not file.filename.endswith('.csv'):
                 raise HTTPException(status_code=400, detail="Only CSV files are supported")
             
-            # Read and process CSV
-            contents = await file.read()
-            df = pd.read_csv(io.BytesIO(contents))
-            df.columns = df.columns.str.strip()
-
-            # Store original data info
-            original_row_count = len(df)
-            original_column_count = len(df.columns)
-            columns = df.columns.tolist()
-            head_data = df.head(10).to_dict(orient='records')
-
-            # Create comprehensive data info for storage
-            df_info = {
-                'filename': file.filename,
-                'rows': original_row_count,
-                'columns': original_column_count,
-                'column_names': columns,
-                'head_data': head_data,
-                'dtypes': {col: str(dtype) for col, dtype in df.dtypes.items()},
-                'missing_values': df.isnull().sum().to_dict(),
-                'numeric_columns': df.select_dtypes(include=["number"]).columns.tolist(),
-                'categorical_columns': df.select_dtypes(include=["object"]).columns.tolist(),
-            }
+            if dataset_id:
+                entry = get_dataset(dataset_id)
+                return await summarize_entry(entry, length, tone, audience, style, stream)
+
+            # Identify the upload by content hash first; a file seen before is served
+            # from the registry or the disk cache instead of being parsed again
+            dataset_id = await run_in_threadpool(hash_stream, file.file)
+            entry = await run_in_threadpool(load_cached, dataset_id)
+            if entry is not None:
+                return await summarize_entry(entry, length, tone, audience, style, stream)
+
+            async def build():
+                # Profile the upload in one streaming pass so files larger than RAM still work
+                _, entry, profile = await run_in_threadpool(
+                    ingest_stream, file.file, file.filename, dataset_id=dataset_id
+                )
+                df_info = await run_in_threadpool(profile.to_df_info, file.filename)
+                return await respond_with_summary(
+                    df_info, entry.dataset_id if entry else None, length, tone, audience, style, stream
+                )
+
+            if stream:
+                return await build()
+            # Identical uploads summarized at the same time are parsed once, keyed by content hash
+            return await summary_flights.run((dataset_id, length, tone, audience, style), build)
 
-            # Sample for AI analysis
-            if len(df) > 5000:
-                df_sample = df.sample(5000)
-            else:
-                df_sample = df
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in summarize_dataset: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
-            # Add sample statistics to df_info
-            df_info['sample_data'] = df_sample.head(5).to_string(index=False)
-            df_info['statistics'] = df_sample.describe().round(2).to_string()
 
-            # Generate AI summary
-            summary_text, mode = await generate_summary_from_info(
-                df_info, length, tone, audience, style
+# ---------------- BACKGROUND SUMMARY JOBS ---------------- #
+
+@router.post("/summary/jobs", status_code=202)
+async def submit_summary_job(request: Request):
+    """
+    Queue a summary and return a job id at once, for files too large to
+    summarize within one request. Accepts the same file or dataset_id and
+    preferences as /summary (multipart, or JSON with a dataset_id).
+    Poll /summary/jobs/{job_id} or subscribe to its /events stream.
+    """
+    if "application/json" in request.headers.get("content-type", ""):
+        data, file = await request.json(), None
+    else:
+        data = await request.form()
+        file = data.get('file')
+
+    dataset_id = data.get('dataset_id')
+    preferences = (
+        data.get('length', 'medium'),
+        data.get('tone', 'professional'),
+        data.get('audience', 'general'),
+        data.get('style', 'Executive Summary'),
+    )
+
+    if dataset_id:
+        entry, upload = get_dataset(dataset_id), None
+    elif file:
+        if not file.filename.endswith('.csv'):
+            raise HTTPException(status_code=400, detail="Only CSV files are supported")
+        # Keep the spooled upload open past the request; the job's cleanup closes it
+        entry, upload, file.file = None, file.file, io.BytesIO()
+        upload.seek(0)
+    else:
+        raise HTTPException(status_code=400, detail="No file or dataset_id provided")
+
+    filename = entry.filename if entry else file.filename
+    try:
+        job = job_queue.submit(
+            "summary",
+            lambda job: run_summary_job(job, entry, upload, filename, *preferences),
+            cleanup=upload.close if upload is not None else None
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        **job.to_dict(),
+        "status_url": request.app.url_path_for("summary_job_status", job_id=job.job_id),
+        "events_url": request.app.url_path_for("summary_job_events", job_id=job.job_id),
+    }
+
+
+@router.get("/summary/jobs/{job_id}")
+async def summary_job_status(job_id: str):
+    """Job status and progress; includes the summary response once done"""
+    return get_job(job_id).to_dict()
+
+
+@router.get("/summary/jobs/{job_id}/events")
+async def summary_job_events(job_id: str):
+    """
+    Server-sent events: a `progress` event on every change, then `done`
+    with the summary response or `error` with the failure.
+    """
+    job = get_job(job_id)
+
+    async def events():
+        version = -1
+        while True:
+            seen = version
+            version = await job.wait_for_change(version, JOB_EVENT_HEARTBEAT)
+            info = job.to_dict(include_result=False)
+            if job.finished:
+                break
+            # Re-sent unchanged after a quiet heartbeat period to keep proxies from closing the stream
+            yield sse_event("progress", info if version != seen else {**info, "heartbeat": True})
+
+        if job.status == "done":
+            yield sse_event("done", job.result)
+        else:
+            yield sse_event("error", {"detail": job.error, "progress": info["progress"]})
+
+    return sse_response(events())
+
+
+def get_job(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job_id: {job_id}")
+    return job
+
+
+async def run_summary_job(
+    job: Job,
+    entry: Optional[DatasetEntry],
+    upload,
+    filename: str,
+    length: str,
+    tone: str,
+    audience: str,
+    style: str
+) -> dict:
+    """Parse and profile (reporting rows as they are parsed), then summarize"""
+    if entry is not None:
+        job.update(stage="profiling")
+        # Datasets reloaded from disk build their stats here; keep that off the event loop
+        stats = await run_in_threadpool(lambda: entry.stats)
+        job.update(rows_parsed=stats.rows)
+        df_info = await run_in_threadpool(stats.to_df_info, entry.filename)
+        dataset_id = entry.dataset_id
+    else:
+        job.update(stage="parsing", rows_parsed=0)
+        try:
+            dataset_id, entry, profile = await run_in_threadpool(
+                ingest_stream, upload, filename, progress=lambda rows: job.update(rows_parsed=rows)
             )
+        finally:
+            upload.close()
+        df_info = await run_in_threadpool(profile.to_df_info, filename)
+        dataset_id = entry.dataset_id if entry else None
 
-            # Generate insights and resources
-            insights = generate_insights(df_info)
-            resources = generate_resources(audience, tone)
+    job.update(stage="summarizing", profiled=True, dataset_id=dataset_id)
+    result = await build_summary_response(df_info, dataset_id, length, tone, audience, style)
+    job.update(summarized=True, mode=result["mode"])
+    return result
 
-            # Return complete response
-            return {
-                "fileName": file.filename,
-                "row_count": original_row_count,
-                "column_count": original_column_count,
-                "columns": columns,
-                "head": head_data,
-                "summary": summary_text,
-                "mode": mode,
-                "insights": insights,
-                "resources": resources,
-                "stats": {
-                    "Rows": original_row_count,
-                    "Columns": original_column_count,
-                    "Missing Values": sum(df.isnull().sum().to_dict().values())
-                },
-                "dataInfo": df_info,
-                "preferences": {
-                    "length": length,
-                    "tone": tone,
-                    "audience": audience
-                }
-            }
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error in summarize_dataset: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+# ---------------- SUMMARIZE PARSED DATASET ---------------- #
 
+async def summarize_entry(
+    entry: DatasetEntry,
+    length: str,
+    tone: str,
+    audience: str,
+    style: str,
+    stream: bool = False
+):
+    """Build the full summary response for a registered dataset"""
+    async def build():
+        # The stats index is normally built at ingest; reloaded datasets build it once here
+        df_info = await run_in_threadpool(lambda: entry.stats.to_df_info(entry.filename))
+        return await respond_with_summary(df_info, entry.dataset_id, length, tone, audience, style, stream)
+
+    if stream:
+        return await build()
+    # Identical summaries requested at the same time (a team opening a shared dataset) run once
+    return await summary_flights.run((entry.dataset_id, length, tone, audience, style), build)
+
+
+async def respond_with_summary(
+    df_info: dict,
+    dataset_id: Optional[str],
+    length: str,
+    tone: str,
+    audience: str,
+    style: str,
+    stream: bool = False
+):
+    if stream:
+        return stream_summary_response(df_info, dataset_id, length, tone, audience, style)
+    return await build_summary_response(df_info, dataset_id, length, tone, audience, style)
 
-# ---------------- GENERATE SUMMARY WITH CUSTOMIZATION ---------------- #
 
-async def generate_summary_from_info(
+def build_summary_metadata(
     df_info: dict,
+    dataset_id: Optional[str],
+    length: str,
+    tone: str,
+    audience: str
+) -> dict:
+    """Deterministic part of the summary response (everything except the AI text)"""
+    return {
+        "dataset_id": dataset_id,
+        "fileName": df_info.get('filename', 'Unknown'),
+        "row_count": df_info.get('rows', 0),
+        "column_count": df_info.get('columns', 0),
+        "columns": df_info.get('column_names', []),
+        "head": df_info.get('head_data', []),
+        "insights": generate_insights(df_info),
+        "resources": generate_resources(audience, tone),
+        "stats": {
+            "Rows": df_info.get('rows', 0),
+            "Columns": df_info.get('columns', 0),
+            "Missing Values": sum(df_info.get('missing_values', {}).values())
+        },
+        "dataInfo": df_info,
+        "preferences": {
+            "length": length,
+            "tone": tone,
+            "audience": audience
+        }
+    }
+
+
+async def build_summary_response(
+    df_info: dict,
+    dataset_id: Optional[str],
     length: str,
     tone: str,
     audience: str,
-    style: str = "Executive Summary"
-) -> tuple[str, str]:
+    style: str
+) -> dict:
+    """Generate the AI summary for a profiled dataset and assemble the response"""
+    summary_text, mode = await generate_summary_from_info(
+        df_info, length, tone, audience, style
+    )
+
+    return {
+        **build_summary_metadata(df_info, dataset_id, length, tone, audience),
+        "summary": summary_text,
+        "mode": mode
+    }
+
+
+def stream_summary_response(
+    df_info: dict,
+    dataset_id: Optional[str],
+    length: str,
+    tone: str,
+    audience: str,
+    style: str
+) -> StreamingResponse:
     """
-    Generate AI summary with customization options
-    Returns: (summary_text, mode)
+    Server-sent events: a `meta` event with stats, insights and head rows
+    right away, then `token` events as the summary is generated and a
+    final `done` event with the full text and mode.
     """
     api_key = os.getenv("TOGETHER_API_KEY")
-    
-    if not api_key:
-        return create_fallback_summary(df_info), "fallback"
+    payload = build_summary_payload(df_info, length, tone, audience, style) if api_key else None
 
+    async def events():
+        yield sse_event("meta", build_summary_metadata(df_info, dataset_id, length, tone, audience))
+        async for event in stream_completion_events(
+            payload, api_key, SUMMARY_TIMEOUT, lambda: create_fallback_summary(df_info), "summary"
+        ):
+            yield event
+
+    return sse_response(events())
+
+
+# ---------------- GENERATE SUMMARY WITH CUSTOMIZATION ---------------- #
+
+def build_summary_payload(
+    df_info: dict,
+    length: str,
+    tone: str,
+    audience: str,
+    style: str
+) -> dict:
+    """Chat completion payload for a summary request"""
     # Build customized prompt
     prompt = build_custom_prompt(df_info, length, tone, audience, style)
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
     # Adjust max_tokens based on length
     token_limits = {
         "concise": 300,
@@ -189,7 +397,7 @@ async def generate_summary_from_info(
     }
     max_tokens = token_limits.get(length, 500)
 
-    payload = {
+    return {
         "model": MODEL_NAME,
         "messages": [
             {"role": "system", "content": get_system_prompt(tone, audience)},
@@ -199,21 +407,28 @@ async def generate_summary_from_info(
         "temperature": 0.4 if tone == "professional" else 0.6
     }
 
-    try:
-        response = requests.post(
-            TOGETHER_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=15
-        )
 
-        if response.status_code == 200:
-            data = response.json()
-            summary_text = data["choices"][0]["message"]["content"]
-            return summary_text, "ai"
-        else:
-            print(f"AI API Error: Status {response.status_code}")
-            return create_fallback_summary(df_info), "fallback"
+async def generate_summary_from_info(
+    df_info: dict,
+    length: str,
+    tone: str,
+    audience: str,
+    style: str = "Executive Summary"
+) -> tuple[str, str]:
+    """
+    Generate AI summary with customization options
+    Returns: (summary_text, mode)
+    """
+    api_key = os.getenv("TOGETHER_API_KEY")
+    
+    if not api_key:
+        return create_fallback_summary(df_info), "fallback"
+
+    payload = build_summary_payload(df_info, length, tone, audience, style)
+
+    try:
+        summary_text = await llm_client.chat_completion(payload, api_key, timeout=SUMMARY_TIMEOUT)
+        return summary_text, "ai"
             
     except Exception as api_error:
         print(f"AI API Error: {api_error}")
@@ -253,15 +468,13 @@ def build_custom_prompt(
         "academic": "Write for researchers and academics. Focus on methodology, statistical validity, research implications, and scholarly rigor."
     }
 
-    # Get sample data and statistics
-    sample_data = df_info.get('sample_data', 'Not available')
-    statistics = df_info.get('statistics', 'Not available')
     columns = df_info.get('column_names', [])
     rows = df_info.get('rows', 0)
     cols = df_info.get('columns', 0)
     missing = df_info.get('missing_values', {})
     
-    prompt = f"""You are analyzing a dataset with the following information:
+    def render(sample_data: str, statistics: str) -> str:
+        return f"""You are analyzing a dataset with the following information:
 
 **Dataset Overview:**
 - Filename: {df_info.get('filename', 'Unknown')}
@@ -269,10 +482,10 @@ def build_custom_prompt(
 - Columns: {cols}
 - Column Names: {', '.join(columns[:10])}{'...' if len(columns) > 10 else ''}
 
-**Sample Data (first 5 rows):**
+**Sample Data (first rows, most informative columns):**
 {sample_data}
 
-**Statistical Summary:**
+**Column Statistics (most informative first):**
 {statistics}
 
 **Data Quality:**
@@ -296,8 +509,12 @@ def build_custom_prompt(
 
 Write a well-structured, coherent summary that follows the specified length, tone, and audience requirements.
 """
-    
-    return prompt
+
+    # Sample rows and column statistics share whatever the fixed text leaves of the token budget
+    data_budget = PROMPT_TOKEN_BUDGET - estimate_tokens(render("", ""))
+    sample_data, statistics = budget_data_sections(df_info, data_budget)
+    # Both sections are filled in one pass, so placeholder-like text in the data is never substituted
+    return render(sample_data, statistics)
 
 
 # ---------------- SYSTEM PROMPT ---------------- #
@@ -349,6 +566,12 @@ def generate_insights(df_info: dict) -> list[str]:
     elif total_missing > rows * 0.1:
         insights.append(f"Significant missing data detected ({total_missing:,} values) - may require imputation")
     
+    # Constant columns carry no information
+    distinct = df_info.get('distinct_values', {})
+    constant_cols = [col for col, count in distinct.items() if count == 1]
+    if constant_cols:
+        insights.append(f"{len(constant_cols)} column(s) hold a single constant value ({', '.join(constant_cols[:3])}) - candidates for removal")
+
     # Column diversity
     if len(numeric_cols) > len(cat_cols):
         insights.append(f"Predominantly numerical data ({len(numeric_cols)} numeric vs {len(cat_cols)} categorical columns) - suitable for quantitative analysis")
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from profiler import profile_dataset
+from query_engine import answer_question
+
+SALES = pd.DataFrame({
+    "region": ["South", "South", "South", "North", "North", "South"],
+    "product": ["Laptop", "Laptop", "Phone", "Laptop", "Phone", "Phone"],
+    "year": [2021, 2022, 2022, 2022, 2021, 2021],
+    "quantity": [5, 7, 2, 9, 4, 11],
+})
+
+
+def ask(question: str):
+    return answer_question(SALES, profile_dataset(SALES), question)
+
+
+def test_number_filters_its_column():
+    answer, query = ask("What is the maximum quantity in 2022?")
+    assert query["filters"] == {"year": [2022]}
+    assert answer.startswith("The maximum quantity where year is 2022 is 9 ")
+
+
+def test_plural_category_value_is_a_filter():
+    answer, query = ask("how many laptops were sold in the south region")
+    assert query["filters"] == {"product": ["Laptop"], "region": ["South"]}
+    assert answer == "There are 2 rows where product is Laptop and region is South."
+
+
+@pytest.mark.parametrize("question", [
+    "What is the maximum quantity in 2019?",
+    "What is the maximum quantity of refurbished laptops?",
+    "how many tablets were sold in the south region",
+])
+def test_unmatched_conditions_are_left_to_the_llm(question):
+    assert ask(question) is None
+
+
+def test_comparison_numbers_are_not_filters():
+    answer, query = ask("how many rows have quantity > 4")
+    assert query["filters"] == {}
+    assert answer == "There are 4 rows where quantity > 4."
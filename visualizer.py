@@ -1,58 +1,238 @@
-import matplotlib
-matplotlib.use("Agg")
-
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
+import asyncio
+import json
 import base64
 import pandas as pd
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
-router = APIRouter()
-
-# ---------------- UTILS ---------------- #
+from chart_cache import chart_cache, if_none_match
+from chart_renderer import (
+    chart_engine, CHART_TYPES, IMAGE_MEDIA_TYPES, FULL_DPI, THUMBNAIL_DPI, RenderQueueFull, RenderTimeout
+)
+from chart_data import CHART_MODES, aggregate_chart_data
+from chart_specs import SPEC_FORMATS, build_chart_spec
+from datasets import (
+    DatasetEntry, get_dataset, hash_stream, load_cached, load_projection, read_schema, register_stream,
+    resolve_dataset, scan_stream
+)
+from dtype_optimizer import plain_values
+from profiler import DatasetProfile, frame_column_info, head_records
+from single_flight import chart_flights
+from streaming import is_truthy
 
-def get_columns(df):
-    """Extract column information from dataframe"""
-    return {
-        "numeric_columns": df.select_dtypes(include=["number"]).columns.tolist(),
-        "categorical_columns": df.select_dtypes(include=["object"]).columns.tolist(),
-        "all_columns": df.columns.tolist()
-    }
+router = APIRouter()
 
+CHART_OUTPUTS = ["json", "image", "url", "spec"]
 
 # ---------------- ANALYZE ENDPOINT (Get Column Info) ---------------- #
 
 @router.post("/analyze-columns")
-async def analyze_columns(file: UploadFile = File(...)):
+async def analyze_columns(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Form(None),
+    sniff: bool = Form(True)               # uploads: infer the schema from the first rows only
+):
     """
     Analyze CSV file and return column information
     This helps the frontend populate dropdowns
+
+    A registered dataset answers from its full profile. With sniff=true
+    (default), an upload that is not registered yet is not parsed: types
+    and sample rows come from its first rows and the row count from a
+    newline count, so the response time barely depends on the file size.
+    dataset_id is null in that case; upload via /datasets to get one.
     """
     try:
-        df = pd.read_csv(file.file)
-        df.columns = df.columns.str.strip()
+        if file is not None and not dataset_id and sniff:
+            upload_id, rows = await run_in_threadpool(scan_stream, file.file)
+            if load_cached(upload_id) is None:
+                schema = await run_in_threadpool(read_schema, file.file)
+                return {
+                    "success": True,
+                    "dataset_id": None,
+                    "total_rows": rows,
+                    "total_columns": len(schema.columns),
+                    "columns": frame_column_info(schema),
+                    "sample_data": schema.head(5).to_dict(orient='records'),
+                    "schema_source": "sniffed"
+                }
+            dataset_id = upload_id
+
+        entry = await resolve_dataset(file, dataset_id)
+        df = entry.df
         
-        columns_info = get_columns(df)
+        columns_info = (await run_in_threadpool(lambda: entry.stats)).column_info()
         
         return {
             "success": True,
+            "dataset_id": entry.dataset_id,
             "total_rows": len(df),
             "total_columns": len(df.columns),
             "columns": columns_info,
-            "sample_data": df.head(5).to_dict(orient='records')
+            "sample_data": head_records(df.head(5)),
+            "schema_source": "dataset"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing file: {str(e)}")
 
 
+# ---------------- CHART PREPARATION ---------------- #
+
+def chart_options(
+    chart_type: str,
+    x_axis: str,
+    y_axis: Optional[str] = None,
+    limit: int = 50,
+    color: str = "#FF6B35",
+    title: str = "",
+    show_grid: bool = True,
+    style: str = "darkgrid",
+    mode: str = "head"
+) -> dict:
+    """
+    Normalized chart request. Used as the render config, the chart cache
+    key and the config echoed back to the client.
+    """
+    if mode not in CHART_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Use: {', '.join(CHART_MODES)}")
+
+    # Prepare title
+    chart_title = title if title else f"{chart_type.capitalize()} Chart: {x_axis}" + (f" vs {y_axis}" if y_axis else "")
+
+    return {
+        "chart_type": chart_type,
+        "x_axis": x_axis,
+        "y_axis": y_axis or None,
+        "limit": max(int(limit), 0),
+        "color": color,
+        "title": chart_title,
+        "show_grid": bool(show_grid),
+        "style": style,
+        "mode": mode
+    }
+
+
+def prepare_chart(
+    df: pd.DataFrame,
+    options: dict,
+    stats: Optional[DatasetProfile] = None
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Validate a chart request against a dataset and return the frame to plot
+    with its render config. mode=head plots the first `limit` rows,
+    mode=sample plots `limit` rows of the dataset's reproducible sample and
+    mode=full aggregates the whole columns down to a fixed-size frame.
+    """
+    chart_type, x_axis, y_axis = options["chart_type"], options["x_axis"], options["y_axis"]
+    limit = options["limit"]
+    mode = options.get("mode", "head")
+
+    # Limit rows for performance
+    if mode == "sample" and stats is not None:
+        df = stats.sample(limit or None)
+    elif mode != "full" and 0 < limit < len(df):
+        df = df.head(limit)
+
+    # Validate x_axis
+    if x_axis not in df.columns:
+        raise HTTPException(status_code=400, detail=f"Invalid X axis column: {x_axis}")
+
+    # Validate y_axis if needed (not required for histogram or pie)
+    if chart_type not in ["hist", "pie"] and (not y_axis or y_axis not in df.columns):
+        raise HTTPException(status_code=400, detail=f"Invalid Y axis column: {y_axis}")
+
+    if chart_type not in CHART_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid chart type. Use: {', '.join(CHART_TYPES)}")
+
+    # Only the plotted columns are shipped to the render worker
+    plot_columns = [x_axis] + ([y_axis] if y_axis and y_axis != x_axis else [])
+    if mode != "full":
+        plot_df = plain_values(df[plot_columns])
+        if stats is not None and x_axis in stats.columns:
+            # Categorical vs binned bars is decided from the dataset's column stats
+            return plot_df, {**options, "x_discrete": stats.columns[x_axis].discrete}
+        return plot_df, options
+
+    plot_df, aggregation = aggregate_chart_data(df[plot_columns], options, stats)
+    return plain_values(plot_df), {**options, "aggregation": aggregation}
+
+
+def prepare_spec(df: pd.DataFrame, options: dict, stats: Optional[DatasetProfile] = None) -> bytes:
+    """Aggregate the plotted rows (in either mode) and encode them as a chart spec"""
+    plot_df, config = prepare_chart(df, options, stats)
+    if "aggregation" not in config:
+        plot_df, aggregation = aggregate_chart_data(plot_df, config)
+        config = {**config, "aggregation": aggregation}
+    return json.dumps(build_chart_spec(plot_df, config), separators=(",", ":")).encode("utf-8")
+
+
+def spec_options(options: dict, spec_format: str = "plotly") -> dict:
+    """Chart options for a client-rendered spec; cached like an image artifact"""
+    if spec_format not in SPEC_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid spec_format. Use: {', '.join(SPEC_FORMATS)}")
+    return {**options, "spec_format": spec_format}
+
+
+def render_options(options: dict, image_format: str = "png", thumbnail: bool = False) -> dict:
+    """Chart options plus the output encoding; this is what the render cache is keyed on"""
+    if image_format not in IMAGE_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid image_format. Use: {', '.join(IMAGE_MEDIA_TYPES)}"
+        )
+    return {**options, "format": image_format, "dpi": THUMBNAIL_DPI if thumbnail else FULL_DPI}
+
+
+async def render_and_cache_chart(entry: DatasetEntry, options: dict, cache_key: str) -> dict:
+    """Render a chart in the worker pool and store the artifact under cache_key"""
+    # Identical charts requested at the same time are rendered once
+    return await chart_flights.run(cache_key, lambda: render_chart_artifact(entry, options, cache_key))
+
+
+async def render_chart_artifact(entry: DatasetEntry, options: dict, cache_key: str) -> dict:
+    stats = await run_in_threadpool(lambda: entry.stats)
+
+    if "spec_format" in options:
+        # The browser renders specs, so only the aggregation runs here
+        chart = {
+            "image": await run_in_threadpool(prepare_spec, entry.df, options, stats),
+            "media_type": "application/json",
+            "columns": entry.column_info()
+        }
+        chart_cache.put(cache_key, **chart)
+        chart_cache.remember_recipe(cache_key, entry.dataset_id, options)
+        return chart
+
+    if options.get("mode", "head") == "full":
+        # Aggregating millions of rows is real work; keep it off the event loop
+        plot_df, render_config = await run_in_threadpool(prepare_chart, entry.df, options, stats)
+    else:
+        plot_df, render_config = prepare_chart(entry.df, options, stats)
+    image_bytes = await chart_engine.render(plot_df, render_config)
+
+    chart = {
+        "image": image_bytes,
+        "media_type": IMAGE_MEDIA_TYPES[options.get("format", "png")],
+        "columns": entry.column_info()
+    }
+    chart_cache.put(cache_key, **chart)
+    chart_cache.remember_recipe(cache_key, entry.dataset_id, options)
+    return chart
+
+
 # ---------------- VISUALIZE ENDPOINT ---------------- #
 
 @router.post("/visualize")
 async def visualize(
-    file: UploadFile = File(...),
+    request: Request,
+    response: Response,
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Form(None),
     chart_type: str = Form(...),           # bar, line, scatter, pie
     x_axis: str = Form(...),
     y_axis: Optional[str] = Form(None),
@@ -60,165 +240,295 @@ async def visualize(
     color: str = Form("#FF6B35"),          # hex color for chart
     title: str = Form(""),                 # custom title
     show_grid: bool = Form(True),
-    style: str = Form("darkgrid")          # seaborn style
+    style: str = Form("darkgrid"),         # seaborn style
+    mode: str = Form("head"),              # head (first `limit` rows), sample or full (whole dataset, aggregated)
+    output: str = Form("json"),            # json, image, url or spec
+    image_format: str = Form("png"),       # png, svg or webp
+    thumbnail: bool = Form(False),         # low-dpi preview
+    spec_format: str = Form("plotly")      # plotly or vega-lite (output=spec)
 ):
     """
-    Generate customized visualizations with user preferences
+    Generate customized visualizations with user preferences.
+
+    mode=sample plots `limit` rows drawn uniformly from the whole dataset
+    (the same rows for the same file). mode=full charts the whole dataset
+    at a fixed render cost: line charts are downsampled (LTTB), large
+    scatters become hexbin densities and histograms / bars / pies are
+    aggregated over every row.
+
+    output=json returns the base64 chart (default), output=image returns the
+    raw image bytes and output=url returns a short link to the cached
+    artifact. thumbnail=true renders a low-dpi preview and links the full
+    resolution chart, which is rendered on demand. output=spec skips
+    server-side rendering and returns a Plotly or Vega-Lite figure with the
+    (aggregated) data inlined for the browser to draw.
+    Responses carry an ETag; repeat requests with If-None-Match get a 304,
+    and cached charts are served without touching pandas or matplotlib.
     """
     try:
-        # Read CSV
-        df = pd.read_csv(file.file)
-        df.columns = df.columns.str.strip()
+        if output not in CHART_OUTPUTS:
+            raise HTTPException(status_code=400, detail=f"Invalid output. Use: {', '.join(CHART_OUTPUTS)}")
 
-        # Limit rows for performance
-        if limit > 0 and limit < len(df):
-            df = df.head(limit)
+        options = chart_options(chart_type, x_axis, y_axis, limit, color, title, show_grid, style, mode)
+        if output == "spec":
+            options = spec_options(options, spec_format)
+        else:
+            options = render_options(options, image_format, thumbnail)
 
-        columns_info = get_columns(df)
+        # Identify the dataset by content hash before parsing anything
+        upload = None
+        if not dataset_id:
+            if file is None:
+                raise HTTPException(status_code=400, detail="Provide either a file or a dataset_id")
+            upload = file.file
+            dataset_id = await run_in_threadpool(hash_stream, upload)
 
-        # Validate x_axis
-        if x_axis not in df.columns:
-            raise HTTPException(status_code=400, detail=f"Invalid X axis column: {x_axis}")
+        cache_key = chart_cache.make_key(dataset_id, options)
+        etag = chart_cache.etag(cache_key)
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
 
-        # Validate y_axis if needed (not required for histogram or pie)
-        if chart_type not in ["hist", "pie"] and (not y_axis or y_axis not in df.columns):
-            raise HTTPException(status_code=400, detail=f"Invalid Y axis column: {y_axis}")
+        if if_none_match(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers)
 
-        # Set seaborn theme
-        sns.set_theme(style=style)
-        plt.figure(figsize=(10, 6))
+        # Chart URLs re-render from the registered dataset, so an upload is registered even
+        # when this chart is already cached (its full-resolution link may not be)
+        filename = (file.filename or "dataset.csv") if file is not None else None
+        entry = None
+        if output == "url" and upload is not None:
+            entry = await run_in_threadpool(register_stream, upload, filename, dataset_id)
 
-        # Prepare title
-        chart_title = title if title else f"{chart_type.capitalize()} Chart: {x_axis}" + (f" vs {y_axis}" if y_axis else "")
+        async def load_and_render() -> dict:
+            # Reuse the registered dataset; a one-off chart of an upload parses only the plotted
+            # columns (and rows, in head mode)
+            chart_entry = entry
+            if chart_entry is None:
+                lookup = load_cached if upload is not None else get_dataset
+                chart_entry = await run_in_threadpool(lookup, dataset_id)
+            if chart_entry is None:
+                columns = [column for column in (x_axis, y_axis) if column]
+                # Bars take categorical vs binned x from the whole column's stats (x_discrete),
+                # so only other charts can stop parsing after the plotted rows
+                nrows = limit if mode == "head" and limit > 0 and chart_type != "bar" else None
+                chart_entry = await run_in_threadpool(load_projection, upload, filename, dataset_id, columns, nrows)
 
-        # -------- CHART GENERATION LOGIC -------- #
-        
-        if chart_type == "bar":
-            # Bar chart
-            if df[x_axis].dtype == 'object' or df[x_axis].nunique() < 20:
-                # Categorical x-axis
-                ax = sns.barplot(data=df, x=x_axis, y=y_axis, color=color)
-                plt.xticks(rotation=45, ha='right')
-            else:
-                # Numeric x-axis - group by bins
-                df_grouped = df.groupby(x_axis)[y_axis].mean().reset_index()
-                ax = sns.barplot(data=df_grouped, x=x_axis, y=y_axis, color=color)
-                
-        elif chart_type == "line":
-            # Line chart
-            ax = sns.lineplot(data=df, x=x_axis, y=y_axis, marker="o", color=color, linewidth=2.5)
-            plt.xticks(rotation=45, ha='right')
-            
-        elif chart_type == "scatter":
-            # Scatter plot
-            ax = sns.scatterplot(data=df, x=x_axis, y=y_axis, color=color, s=100, alpha=0.6, edgecolors='white')
-            
-        elif chart_type == "pie":
-            # Pie chart
-            if df[x_axis].dtype == 'object':
-                value_counts = df[x_axis].value_counts().head(10)  # Top 10 categories
-            else:
-                value_counts = df[x_axis].value_counts().head(10)
-            
-            colors_list = sns.color_palette("husl", len(value_counts))
-            plt.pie(value_counts.values, labels=value_counts.index, autopct='%1.1f%%', 
-                   colors=colors_list, startangle=90)
-            plt.axis('equal')
-            
-        elif chart_type == "hist":
-            # Histogram
-            ax = sns.histplot(df[x_axis], bins=30, color=color, kde=True)
-            
-        else:
-            raise HTTPException(status_code=400, detail="Invalid chart type. Use: bar, line, scatter, pie, hist")
+            # -------- CHART GENERATION (worker pool) -------- #
+            return await render_chart_artifact(chart_entry, options, cache_key)
 
-        # Apply title and styling
-        plt.title(chart_title, fontsize=16, fontweight='bold', pad=20)
-        
-        if chart_type != "pie":
-            plt.xlabel(x_axis, fontsize=12, fontweight='bold')
-            if y_axis:
-                plt.ylabel(y_axis, fontsize=12, fontweight='bold')
-            
-            if show_grid:
-                plt.grid(True, alpha=0.3)
-            else:
-                plt.grid(False)
-
-        plt.tight_layout()
+        chart = chart_cache.get(cache_key)
+        if chart is None:
+            # Identical requests at the same time share one parse and one render
+            chart = await chart_flights.run(cache_key, load_and_render)
+
+        # -------- DELIVERY -------- #
+        if output == "image":
+            return Response(content=chart["image"], media_type=chart["media_type"], headers=cache_headers)
+
+        response.headers.update(cache_headers)
+
+        if output == "spec":
+            return {
+                "success": True,
+                "dataset_id": dataset_id,
+                "spec_format": spec_format,
+                "spec": json.loads(chart["image"]),
+                "columns": chart["columns"],
+                "config": options
+            }
+
+        if output == "url":
+            chart_cache.remember_recipe(cache_key, dataset_id, options)
+            result = {
+                "success": True,
+                "dataset_id": dataset_id,
+                "chart_url": str(request.url_for("get_chart_artifact", chart_key=cache_key)),
+                "media_type": chart["media_type"],
+                "columns": chart["columns"],
+                "config": options
+            }
+            if thumbnail:
+                # Full resolution is only rendered if the client follows this link
+                full_options = {**options, "dpi": FULL_DPI}
+                full_key = chart_cache.make_key(dataset_id, full_options)
+                chart_cache.remember_recipe(full_key, dataset_id, full_options)
+                result["full_resolution_url"] = str(request.url_for("get_chart_artifact", chart_key=full_key))
+            return result
 
         # -------- ENCODE IMAGE TO BASE64 -------- #
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=150, bbox_inches='tight')
-        buf.seek(0)
-        img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-        plt.close()
+        img_base64 = base64.b64encode(chart["image"]).decode("utf-8")
 
         return {
             "success": True,
+            "dataset_id": dataset_id,
             "chart": img_base64,
-            "chart_url": f"data:image/png;base64,{img_base64}",
-            "columns": columns_info,
-            "config": {
-                "chart_type": chart_type,
-                "x_axis": x_axis,
-                "y_axis": y_axis,
-                "limit": limit,
-                "color": color,
-                "title": chart_title,
-                "style": style
-            }
+            "chart_url": f"data:{chart['media_type']};base64,{img_base64}",
+            "columns": chart["columns"],
+            "config": options
         }
 
     except HTTPException:
-        plt.close()
         raise
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating visualization: {str(e)}")
+
+
+# ---------------- CHART ARTIFACTS ---------------- #
+
+@router.get("/charts/{chart_key}", name="get_chart_artifact")
+async def get_chart_artifact(chart_key: str, request: Request):
+    """
+    Serve a rendered chart by its cache key as raw image bytes.
+    Evicted or not-yet-rendered charts are rendered on demand from their recipe.
+    """
+    etag = chart_cache.etag(chart_key)
+    # Keys are content-addressed, so the artifact behind a URL never changes
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        chart = chart_cache.get(chart_key)
+        if chart is None:
+            recipe = chart_cache.recipe(chart_key)
+            if recipe is None:
+                raise HTTPException(status_code=404, detail="Chart not found. Request it again via /api/visualize")
+
+            dataset_id, options = recipe
+            chart = await render_and_cache_chart(get_dataset(dataset_id), options, chart_key)
+
+        return Response(content=chart["image"], media_type=chart["media_type"], headers=headers)
+
+    except HTTPException:
+        raise
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        plt.close()
         raise HTTPException(status_code=500, detail=f"Error generating visualization: {str(e)}")
 
 
 # ---------------- BATCH VISUALIZE (Multiple Charts) ---------------- #
 
+async def render_batch_chart(
+    entry: DatasetEntry,
+    index: int,
+    chart_config: dict,
+    slots: asyncio.Semaphore,
+    request: Request,
+    output: str = "json"
+) -> dict:
+    """Render one chart of a batch; failures are reported in the result instead of raised"""
+    try:
+        options = chart_options(
+            chart_config.get('chart_type'),
+            chart_config.get('x_axis'),
+            chart_config.get('y_axis'),
+            int(chart_config.get('limit', 50)),
+            chart_config.get('color', '#FF6B35'),
+            chart_config.get('title', ''),
+            is_truthy(chart_config.get('show_grid', True)),
+            chart_config.get('style', 'darkgrid'),
+            chart_config.get('mode', 'head')
+        )
+        if output == "spec":
+            options = spec_options(options, chart_config.get('spec_format', 'plotly'))
+        else:
+            options = render_options(
+                options,
+                chart_config.get('image_format', 'png'),
+                is_truthy(chart_config.get('thumbnail', False))
+            )
+        cache_key = chart_cache.make_key(entry.dataset_id, options)
+
+        chart = chart_cache.get(cache_key)
+        if chart is None:
+            async with slots:
+                chart = await render_and_cache_chart(entry, options, cache_key)
+
+        result = {
+            "index": index,
+            "chart_type": options["chart_type"],
+            "status": "success",
+            "etag": chart_cache.etag(cache_key),
+            "media_type": chart["media_type"],
+            "config": options
+        }
+
+        if output == "url":
+            result["chart_url"] = str(request.url_for("get_chart_artifact", chart_key=cache_key))
+        elif output == "spec":
+            result["spec"] = json.loads(chart["image"])
+        else:
+            img_base64 = base64.b64encode(chart["image"]).decode("utf-8")
+            result["chart"] = img_base64
+            result["chart_url"] = f"data:{chart['media_type']};base64,{img_base64}"
+        return result
+
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        return {
+            "index": index,
+            "chart_type": chart_config.get('chart_type'),
+            "status": "error",
+            "error": detail
+        }
+
+
 @router.post("/visualize-batch")
 async def visualize_batch(
-    file: UploadFile = File(...),
-    configs: str = Form(...)  # JSON string of chart configurations
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Form(None),
+    configs: str = Form(...),  # JSON string of chart configurations
+    stream: bool = Form(False),
+    output: str = Form("json")  # json (base64 charts), url (artifact links) or spec
 ):
     """
     Generate multiple visualizations at once
-    configs should be a JSON array of chart configurations
+    configs should be a JSON array of chart configurations (same options as /visualize).
+    Charts render in parallel; with stream=true each chart is sent as a
+    JSON line as soon as it finishes. output=url returns /api/charts links
+    instead of inlining every image; output=spec returns client-side specs.
     """
-    import json
-    
     try:
-        df = pd.read_csv(file.file)
-        df.columns = df.columns.str.strip()
-        
+        if output not in ("json", "url", "spec"):
+            raise HTTPException(status_code=400, detail="Invalid output. Use: json, url, spec")
+
+        entry = await resolve_dataset(file, dataset_id)
+
         chart_configs = json.loads(configs)
-        results = []
-        
-        for config in chart_configs:
-            chart_type = config.get('chart_type')
-            x_axis = config.get('x_axis')
-            y_axis = config.get('y_axis')
-            limit = config.get('limit', 50)
-            color = config.get('color', '#FF6B35')
-            title = config.get('title', '')
-            
-            # Generate individual chart
-            # (Reuse logic from main visualize function)
-            # For brevity, this is a simplified version
-            
-            results.append({
-                "chart_type": chart_type,
-                "status": "success"
-            })
-        
+        if not isinstance(chart_configs, list):
+            raise HTTPException(status_code=400, detail="configs must be a JSON array")
+
+        # Leave room in the render queue for other requests
+        slots = asyncio.Semaphore(max(chart_engine.workers, 1))
+        jobs = [
+            asyncio.ensure_future(render_batch_chart(entry, index, config, slots, request, output))
+            for index, config in enumerate(chart_configs)
+        ]
+
+        if stream:
+            async def chart_lines():
+                for job in asyncio.as_completed(jobs):
+                    result = await job
+                    yield json.dumps({"dataset_id": entry.dataset_id, **result}) + "\n"
+
+            return StreamingResponse(chart_lines(), media_type="application/x-ndjson")
+
+        results = await asyncio.gather(*jobs)
+
         return {
             "success": True,
+            "dataset_id": entry.dataset_id,
             "charts": results
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error in batch visualization: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error in batch visualization: {str(e)}")